@@ -1,11 +1,16 @@
+import atexit
 import datetime
 import json
 import os
-import logging
-from collections import deque
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+from types import MappingProxyType
 from typing import Any, Dict, Callable
 
-import stripe  # type: ignore
+from .logging_config import get_logger
 
 # Billing & usage scaffold with gradual enhancement toward full Stripe integration.
 # Tiers:
@@ -15,15 +20,67 @@ import stripe  # type: ignore
 
 FREE_LIMIT_DEFAULT = 500
 USAGE_FLUSH_INTERVAL = 50  # flush to Firestore every N increments (if configured)
+USAGE_WRITE_BATCH_SIZE = 40  # max queued usage snapshots committed per Firestore batch
+USAGE_WRITE_MAX_ATTEMPTS = 3  # retries for contended (Aborted) batch commits
+USAGE_WRITE_RETRY_BACKOFF_SECONDS = 0.05  # first retry delay, doubled per attempt
+USAGE_PUBLISH_INTERVAL_SECONDS = 5  # coalescing window for Stripe UsageRecord publishes
+USAGE_PUBLISH_MAX_UNITS = 1000  # flush early once an item accumulates this many units
+TIER_CACHE_TTL_SECONDS = 30  # how long a dynamically resolved tier is reused per project
+NEGATIVE_CACHE_TTL_SECONDS = 60  # remember missing Firestore docs to avoid repeat lookups
+
+_TRUE_SET = frozenset({"1", "true", "yes", "on"})
+# Env-derived switches, snapshotted at import; call refresh_env() after changing them.
+_PERSIST_IDEMPOTENCY = os.getenv("BILLING_PERSIST_IDEMPOTENCY", "").lower() in _TRUE_SET
+# No Firestore and no Stripe: usage stays purely in memory (skip persistence/metering)
+_LOCAL_ONLY = not os.getenv("FIRESTORE_PROJECT") and not os.getenv("STRIPE_API_KEY")
+
+
+def _tier_from_env() -> str | None:
+    val = os.getenv("ODIN_BILLING_TIER", "auto").lower()
+    return None if val in ("", "auto") else val
+
+
+# Static tier from ODIN_BILLING_TIER (None = auto); see set_tier_override()
+_TIER_OVERRIDE = _tier_from_env()
+
+# Stripe SDK module, imported on first use (see _stripe()) to keep cold start light
+stripe: Any = None
 
-_usage_cache: dict[str, int] = {}
+_log = get_logger("odin.billing", level_env="ODIN_BILLING_LOG_LEVEL", default_level="WARNING")
+
+_usage_cache: Counter[str] = Counter()
 _usage_cache_month: str | None = None
+_month_key_cache: tuple[float, str] = (0.0, "")  # (expires_at epoch seconds, month key)
 # subscription state cache: project_id -> {tier, status, usage_item?}
 _subscription_cache: dict[str, Dict[str, str]] = {}
-_processed_event_ids: deque[str] = deque(maxlen=500)  # in-memory webhook idempotency window
+# Shared read-only default for .get() chains (avoids a throwaway dict per lookup)
+_EMPTY_MAPPING: Mapping[str, Any] = MappingProxyType({})
+# resolved dynamic tier cache: project_id -> (expires_at monotonic, tier)
+_tier_cache: dict[str, tuple[float, str]] = {}
+# negative caches for absent Firestore docs: key -> expires_at (monotonic)
+_sub_neg_cache: dict[str, float] = {}  # project_id
+_usage_neg_cache: dict[str, float] = {}  # usage doc id
+# in-memory webhook idempotency window: event_id -> processed at (monotonic), oldest
+# first; O(1) membership and FIFO eviction in one structure
+_processed_events: OrderedDict[str, float] = OrderedDict()
+_PROCESSED_EVENTS_MAX = 10_000
+_processed_events_lock = threading.Lock()  # webhooks run on threadpool threads
+
+# Background Firestore usage writer: record_receipt enqueues (project_id, month, count)
+# snapshots; a daemon thread drains them into batched commits off the request path.
+_usage_write_queue: queue.Queue[tuple[str, str, int]] = queue.Queue()
+_usage_writer: threading.Thread | None = None
+_usage_writer_lock = threading.Lock()
 
 # Hook for publishing metered usage (injected for tests)
 _usage_publisher: Callable[[str, int, int], None] | None = None  # args: subscription_item, quantity, timestamp
+_usage_publisher_batched = False  # True: injected publisher gets coalesced sums on flush
+
+# Coalesced Stripe metered usage: subscription_item -> units not yet published
+_pending_usage: dict[str, int] = {}
+_pending_usage_lock = threading.Lock()
+_usage_flush_wakeup = threading.Event()
+_usage_flusher: threading.Thread | None = None
 
 
 def utc_now() -> datetime.datetime:
@@ -31,43 +88,77 @@ def utc_now() -> datetime.datetime:
     return datetime.datetime.now(datetime.UTC)
 
 
-def _logger() -> logging.Logger:
-    # Defer import to avoid circular in edge cases
-    from .logging_config import get_logger  # type: ignore
-
-    return get_logger("odin.billing", level_env="ODIN_BILLING_LOG_LEVEL", default_level="WARNING")
+def _iso_z(dt: datetime.datetime) -> str:
+    """ISO-8601 'Z' stamp for persisted docs (isoformat beats strftime on CPython)."""
+    return dt.isoformat().replace("+00:00", "Z")
 
 
 def _current_month_key() -> str:
+    """Return the UTC 'YYYY-MM' key, recomputed only once the month rolls over."""
+    global _month_key_cache
+    expires_at, key = _month_key_cache
+    if time.time() < expires_at:
+        return key
     now = utc_now()
-    return f"{now.year:04d}-{now.month:02d}"
+    key = f"{now.year:04d}-{now.month:02d}"
+    next_month = datetime.datetime(
+        now.year + (now.month == 12), now.month % 12 + 1, 1, tzinfo=datetime.UTC
+    )
+    _month_key_cache = (next_month.timestamp(), key)
+    return key
 
 
-def _reset_month_if_needed():
-    global _usage_cache_month, _usage_cache
+def _reset_month_if_needed() -> str:
+    """Roll the usage cache at month boundaries; returns the current month key."""
+    global _usage_cache_month
     mk = _current_month_key()
     if _usage_cache_month != mk:
-        _usage_cache = {}
+        _usage_cache.clear()
         _usage_cache_month = mk
+    return mk
+
+
+def refresh_env() -> None:
+    """Re-read env-derived billing settings snapshotted at import (tests / hot reload)."""
+    global _PERSIST_IDEMPOTENCY, _LOCAL_ONLY, _TIER_OVERRIDE
+    _PERSIST_IDEMPOTENCY = os.getenv("BILLING_PERSIST_IDEMPOTENCY", "").lower() in _TRUE_SET
+    _LOCAL_ONLY = not os.getenv("FIRESTORE_PROJECT") and not os.getenv("STRIPE_API_KEY")
+    _TIER_OVERRIDE = _tier_from_env()
+    _reset_price_tier_map()
+
+
+def set_tier_override(tier: str | None) -> None:
+    """Pin the tier for every project (None or 'auto' restores dynamic lookup)."""
+    global _TIER_OVERRIDE
+    val = (tier or "").lower()
+    _TIER_OVERRIDE = None if val in ("", "auto") else val
 
 
 def configured_tier(project_id: str | None = None) -> str:
     """Return active tier.
 
     Priority:
-      1. Explicit ODIN_BILLING_TIER env if value in (free, pro, enterprise)
-         or if set to another known static tier (starter, team).
-      2. If env is 'auto' (or unset), attempt dynamic subscription lookup (Firestore or cache).
+      1. Static override: set_tier_override() or ODIN_BILLING_TIER (read at import /
+         refresh_env()) if value in (free, pro, enterprise) or another known static
+         tier (starter, team).
+      2. If 'auto' (or unset), attempt dynamic subscription lookup (Firestore or cache).
       3. Fallback to 'free'.
+
+    Dynamic results are cached per project for TIER_CACHE_TTL_SECONDS and dropped
+    whenever a webhook records new subscription state for that project.
     """
-    val = os.getenv("ODIN_BILLING_TIER", "auto").lower()
-    if val != "auto" and val:
-        return val
-    if project_id:
-        sub = _load_subscription_state(project_id)
-        if sub:
-            return sub.get("tier", "free")
-    return "free"
+    if _TIER_OVERRIDE is not None:
+        return _TIER_OVERRIDE
+    if not project_id:
+        return "free"
+    now = time.monotonic()
+    cached = _tier_cache.get(project_id)
+    if cached and cached[0] > now:
+        return cached[1]
+    sub = _load_subscription_state(project_id)
+    tier = sub.get("tier", "free") if sub else "free"
+    _tier_cache[project_id] = (now + TIER_CACHE_TTL_SECONDS, tier)
+    return tier
 
 
 def free_tier_limit() -> int:
@@ -77,6 +168,16 @@ def free_tier_limit() -> int:
         return FREE_LIMIT_DEFAULT
 
 
+def _stripe() -> Any:
+    """Return the stripe module, importing it lazily on first use."""
+    global stripe
+    if stripe is None:
+        import stripe as _stripe_mod  # type: ignore
+
+        stripe = _stripe_mod
+    return stripe
+
+
 def stripe_configured() -> bool:
     return bool(os.getenv("STRIPE_API_KEY"))
 
@@ -84,29 +185,35 @@ def stripe_configured() -> bool:
 def init_stripe():  # pragma: no cover - simple env wiring
     key = os.getenv("STRIPE_API_KEY")
     if key:
-        stripe.api_key = key
+        _stripe().api_key = key
 
 
 def current_usage(project_id: str) -> int:
     _reset_month_if_needed()
-    return _usage_cache.get(project_id, 0)
+    return _usage_cache[project_id]
 
 
 def record_receipt(project_id: str, metered: bool = True) -> None:
     """Increment in-memory usage and periodically persist.
 
+    Every USAGE_FLUSH_INTERVAL increments a snapshot is queued for the background
+    usage writer, so the request path never waits on Firestore.
+
     Firestore persistence (if FIRESTORE_PROJECT set) stores aggregated monthly count:
       collection: billing_usage
         doc id: {project_id}_{YYYY-MM}
         fields: project_id, month, count, updated_at
     """
-    _reset_month_if_needed()
-    _usage_cache[project_id] = _usage_cache.get(project_id, 0) + 1
+    month = _reset_month_if_needed()
+    _usage_cache[project_id] += 1
+    if _LOCAL_ONLY and _usage_publisher is None:
+        return  # nothing to persist or meter
     count = _usage_cache[project_id]
     # Periodic flush to Firestore
     flush_every = _env_int("USAGE_FLUSH_INTERVAL", USAGE_FLUSH_INTERVAL)
-    if flush_every > 0 and count % flush_every == 0:
-        _persist_usage_firestore(project_id, count)
+    if flush_every > 0 and count % flush_every == 0 and os.getenv("FIRESTORE_PROJECT"):
+        _ensure_usage_writer()
+        _usage_write_queue.put_nowait((project_id, month, count))
     # Metered usage: publish increment if enabled via env and tier supports it
     if metered and configured_tier(project_id) in {"pro", "team", "enterprise"}:
         _maybe_publish_metered_usage(project_id, 1)
@@ -125,9 +232,8 @@ def enforce_quota(project_id: str):
 
 def usage_summary(project_id: str) -> Dict[str, Any]:
     """Return usage, limit, tier, month (combining in-memory + Firestore, favoring memory)."""
-    _reset_month_if_needed()
-    month = _usage_cache_month or _current_month_key()
-    current = current_usage(project_id)
+    month = _reset_month_if_needed()
+    current = _usage_cache[project_id]
     # If memory count is zero, attempt to load persisted (warm start scenario)
     if current == 0:
         persisted = _load_usage_firestore(project_id, month)
@@ -154,38 +260,121 @@ def _env_int(name: str, default: int) -> int:
         return default
 
 
+_fs_client: Any | None = None
+_fs_client_project: str | None = None  # project the cached client (or failure) belongs to
+_fs_client_lock = threading.Lock()
+
+
 def _firestore_client():  # pragma: no cover - lazy import pattern
+    """Return a process-wide Firestore client for FIRESTORE_PROJECT (or None).
+
+    The client (and its gRPC channel) is built once and reused; a failed
+    construction is remembered too so we do not retry on every call.
+    """
+    global _fs_client, _fs_client_project
     project = os.getenv("FIRESTORE_PROJECT")
     if not project:
         return None
-    try:
-        from google.cloud import firestore  # type: ignore
+    if _fs_client_project == project:
+        return _fs_client
+    with _fs_client_lock:
+        if _fs_client_project != project:
+            try:
+                from google.cloud import firestore  # type: ignore
 
-        return firestore.Client(project=project)  # type: ignore
-    except Exception:
-        return None
+                _fs_client = firestore.Client(project=project)  # type: ignore
+            except Exception as e:
+                _log.debug(f"Firestore client unavailable (non-fatal): {e}")
+                _fs_client = None
+            _fs_client_project = project
+    return _fs_client
 
 
 def _usage_doc_id(project_id: str, month: str) -> str:
     return f"{project_id}_{month}"
 
 
-def _persist_usage_firestore(project_id: str, count: int):  # pragma: no cover - network
-    client = _firestore_client()
-    if not client:
-        return
-    month = _current_month_key()
-    doc_id = _usage_doc_id(project_id, month)
-    data = {
+def _usage_doc(project_id: str, month: str, count: int) -> dict[str, Any]:
+    return {
         "project_id": project_id,
         "month": month,
         "count": count,
-        "updated_at": utc_now().isoformat().replace("+00:00", "Z"),
+        "updated_at": _iso_z(utc_now()),
     }
+
+
+def _commit_usage_batch(items: list[tuple[str, str, int]]) -> None:  # pragma: no cover - network
+    """Commit queued usage snapshots in a single Firestore WriteBatch.
+
+    Snapshots are coalesced per doc id (last one wins, counts only grow within a
+    month) so a burst of flushes for the same project costs one write.
+    """
+    client = _firestore_client()
+    if not client or not items:
+        return
+    latest: dict[str, tuple[str, str, int]] = {}
+    for project_id, month, count in items:
+        latest[_usage_doc_id(project_id, month)] = (project_id, month, count)
     try:
-        client.collection("billing_usage").document(doc_id).set(data)
-    except Exception as e:
-        _logger().debug(f"Failed persisting usage to Firestore (non-fatal): {e}")
+        from google.api_core.exceptions import Aborted  # type: ignore
+
+        retryable: tuple[type[BaseException], ...] = (Aborted,)
+    except Exception:
+        retryable = ()
+    collection = client.collection("billing_usage")
+    for attempt in range(1, USAGE_WRITE_MAX_ATTEMPTS + 1):
+        try:
+            batch = client.batch()
+            for doc_id, (project_id, month, count) in latest.items():
+                data = _usage_doc(project_id, month, count)
+                batch.set(collection.document(doc_id), data, merge=True)
+            batch.commit()
+            return
+        except Exception as e:
+            if isinstance(e, retryable) and attempt < USAGE_WRITE_MAX_ATTEMPTS:
+                # back off so the contended documents get a chance to settle
+                time.sleep(USAGE_WRITE_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+                continue
+            _log.debug(f"Failed persisting usage batch to Firestore (non-fatal): {e}")
+            return
+
+
+def _drain_usage_queue(first: tuple[str, str, int] | None = None) -> list[tuple[str, str, int]]:
+    items = [first] if first else []
+    while len(items) < USAGE_WRITE_BATCH_SIZE:
+        try:
+            items.append(_usage_write_queue.get_nowait())
+        except queue.Empty:
+            break
+    return items
+
+
+def _usage_writer_loop() -> None:  # pragma: no cover - background thread
+    while True:
+        first = _usage_write_queue.get()
+        _commit_usage_batch(_drain_usage_queue(first))
+
+
+def _ensure_usage_writer() -> None:
+    global _usage_writer
+    if _usage_writer is not None:
+        return
+    with _usage_writer_lock:
+        if _usage_writer is None:
+            _usage_writer = threading.Thread(
+                target=_usage_writer_loop, name="odin-usage-writer", daemon=True
+            )
+            _usage_writer.start()
+            atexit.register(flush_usage_writes)
+
+
+def flush_usage_writes() -> None:
+    """Synchronously commit any queued usage snapshots (shutdown / tests)."""
+    while True:
+        items = _drain_usage_queue()
+        if not items:
+            return
+        _commit_usage_batch(items)
 
 
 def _load_usage_firestore(project_id: str, month: str) -> int | None:  # pragma: no cover
@@ -193,17 +382,30 @@ def _load_usage_firestore(project_id: str, month: str) -> int | None:  # pragma:
     if not client:
         return None
     doc_id = _usage_doc_id(project_id, month)
+    if _negative_cached(_usage_neg_cache, doc_id):
+        return None
     try:
         snap = client.collection("billing_usage").document(doc_id).get()
         if snap.exists:  # type: ignore[attr-defined]
             data = snap.to_dict()  # type: ignore
             return int(data.get("count", 0))
     except Exception as e:
-        _logger().debug(f"Failed loading usage from Firestore: {e}")
+        _log.debug(f"Failed loading usage from Firestore: {e}")
         return None
+    _usage_neg_cache[doc_id] = time.monotonic() + NEGATIVE_CACHE_TTL_SECONDS
     return None
 
 
+def _negative_cached(cache: dict[str, float], key: str) -> bool:
+    expires_at = cache.get(key)
+    if expires_at is None:
+        return False
+    if time.monotonic() < expires_at:
+        return True
+    cache.pop(key, None)
+    return False
+
+
 # --- Stripe checkout & webhook scaffolding ----------------------------------------
 
 def required_prices_present() -> bool:
@@ -236,7 +438,7 @@ def create_checkout_session(
     }
     if customer_email:
         params["customer_email"] = customer_email
-    session = stripe.checkout.Session.create(**params)  # type: ignore
+    session = _stripe().checkout.Session.create(**params)  # type: ignore
     return {"id": session.id, "url": session.url}  # type: ignore[attr-defined]
 
 
@@ -245,106 +447,145 @@ def verify_webhook(signature_header: str, payload: bytes):  # pragma: no cover -
     if not secret:
         raise RuntimeError("Missing STRIPE_WEBHOOK_SECRET")
     try:
-        event = stripe.Webhook.construct_event(
+        event = _stripe().Webhook.construct_event(
             payload=payload,
             sig_header=signature_header,
             secret=secret,
         )
         return event
     except Exception as e:
-        _logger().warning(f"Webhook verification failed: {e}")
+        _log.warning(f"Webhook verification failed: {e}")
         raise
 
 
+def _event_parts(event: Any) -> tuple[str | None, str | None, dict[str, Any]]:
+    """Return (type, id, data.object) for Stripe SDK events and plain test doubles.
+
+    data.object is always a dict (Stripe objects subclass dict); {} when absent.
+    """
+    try:
+        etype, event_id, data = event.type, event.id, event.data
+    except AttributeError:
+        etype = getattr(event, "type", None)
+        event_id = getattr(event, "id", None)
+        data = getattr(event, "data", None)
+    obj = data.get("object") if isinstance(data, dict) else getattr(data, "object", None)
+    return etype, event_id, obj if isinstance(obj, dict) else {}
+
+
+def _field(obj: Any, name: str) -> Any:
+    """Read a field from a plain dict (webhook JSON) or an SDK/attribute object."""
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
 def handle_webhook_event(event: Any) -> dict[str, Any]:  # pragma: no cover - placeholder
     """Process Stripe events with tier inference, usage item extraction & idempotency."""
-    etype = getattr(event, "type", None)
-    event_id = getattr(event, "id", None)
-    data_obj = getattr(event, "data", {}).get("object") if hasattr(event, "data") else None
+    etype, event_id, data_obj = _event_parts(event)
     project_id = None
     changed = False
     # Fast in-memory idempotency check
-    if event_id and event_id in _processed_event_ids:
+    if event_id and event_id in _processed_events:
         return {"received": True, "idempotent": True, "type": etype, "project_id": None, "tier_changed": False, "tier": None}
     # Optional persistent idempotency (Firestore) for multi-replica reliability
-    if event_id and os.getenv("BILLING_PERSIST_IDEMPOTENCY", "").lower() in {"1", "true", "yes", "on"}:
+    if event_id and _PERSIST_IDEMPOTENCY:
         if _persistent_event_seen(event_id):  # pragma: no cover - network
-            _processed_event_ids.append(event_id)
+            _remember_event_id(event_id)
             return {"received": True, "idempotent": True, "type": etype, "project_id": None, "tier_changed": False, "tier": None}
     try:
-        if data_obj and isinstance(data_obj, dict):
-            meta = data_obj.get("metadata") or {}
-            project_id = meta.get("project_id")
+        project_id = (data_obj.get("metadata") or _EMPTY_MAPPING).get("project_id")
         if etype == "checkout.session.completed" and project_id:
+            usage_price = os.getenv("STRIPE_PRICE_USAGE")
+            price_ids: list[str] = []
+            usage_item = None
             try:
-                sid = data_obj.get("id")
-                session = stripe.checkout.Session.retrieve(sid, expand=["line_items"])  # type: ignore
-                price_ids = [li.price.id for li in session.line_items.data]  # type: ignore[attr-defined]
+                # line items already expanded on the event object: skip the API round-trip
+                line_items = (data_obj.get("line_items") or _EMPTY_MAPPING).get("data")
+                if not line_items:
+                    sid = data_obj.get("id")
+                    session = _stripe().checkout.Session.retrieve(sid, expand=["line_items"])  # type: ignore
+                    line_items = session.line_items.data  # type: ignore[attr-defined]
+                # single pass: collect price ids and spot the metered usage line item
+                for li in line_items:
+                    price_id = _field(_field(li, "price"), "id")
+                    price_ids.append(price_id)
+                    if usage_price and usage_item is None and price_id == usage_price:
+                        usage_item = _field(li, "id")
             except Exception as e:
-                _logger().debug(f"Checkout session retrieve failed: {e}")
-                price_ids = []
+                _log.debug(f"Checkout session retrieve failed: {e}")
+                price_ids, usage_item = [], None
             tier = _infer_tier_from_prices(price_ids)
             if tier:
-                usage_item = None
-                try:
-                    line_items = session.line_items.data  # type: ignore[attr-defined]
-                    usage_price = os.getenv("STRIPE_PRICE_USAGE")
-                    if usage_price:
-                        for li in line_items:
-                            if getattr(li, "price", None) and getattr(li.price, "id", None) == usage_price:  # type: ignore[attr-defined]
-                                usage_item = getattr(li, "id", None)
-                                break
-                except Exception as e:
-                    _logger().debug(f"Line item parse failed: {e}")
                 _record_subscription_state(project_id, tier, "active", usage_item=usage_item)
                 changed = True
         elif etype in {"customer.subscription.updated", "customer.subscription.created"}:
-            items = []
             price_ids = []
-            if data_obj and isinstance(data_obj, dict):
-                items = data_obj.get("items", {}).get("data", [])
-                price_ids = [it.get("price", {}).get("id") for it in items]
+            usage_item = None
+            usage_price = os.getenv("STRIPE_PRICE_USAGE")
+            for it in (data_obj.get("items") or _EMPTY_MAPPING).get("data") or ():
+                price = it.get("price") or _EMPTY_MAPPING
+                price_id = price.get("id")
+                price_ids.append(price_id)
                 if not project_id:
-                    for it in items:
-                        pid = it.get("price", {}).get("metadata", {}).get("project_id")
-                        if pid:
-                            project_id = pid
-                            break
+                    project_id = (price.get("metadata") or _EMPTY_MAPPING).get("project_id") or None
+                if usage_price and usage_item is None and price_id == usage_price:
+                    usage_item = it.get("id")
             tier = _infer_tier_from_prices(price_ids)
             if tier and project_id:
-                status = data_obj.get("status", "active") if isinstance(data_obj, dict) else "active"
-                usage_item = None
-                usage_price = os.getenv("STRIPE_PRICE_USAGE")
-                if usage_price:
-                    for it in items:
-                        price_id = it.get("price", {}).get("id")
-                        if price_id == usage_price:
-                            usage_item = it.get("id")
-                            break
+                status = data_obj.get("status", "active")
                 _record_subscription_state(project_id, tier, status, usage_item=usage_item)
                 changed = True
     except Exception as e:
-        _logger().warning(f"Webhook handling error: {e}")
+        _log.warning(f"Webhook handling error: {e}")
     if event_id:
-        _processed_event_ids.append(event_id)
-        if os.getenv("BILLING_PERSIST_IDEMPOTENCY", "").lower() in {"1", "true", "yes", "on"}:
+        _remember_event_id(event_id)
+        if _PERSIST_IDEMPOTENCY:
             _persist_processed_event_id(event_id)  # pragma: no cover - network
     return {"received": True, "idempotent": False, "type": etype, "project_id": project_id, "tier_changed": changed, "tier": configured_tier(project_id) if project_id else None}
 
 
+def _remember_event_id(event_id: str) -> None:
+    """Append to the idempotency window, evicting the oldest ids."""
+    with _processed_events_lock:
+        if event_id in _processed_events:
+            return
+        while len(_processed_events) >= _PROCESSED_EVENTS_MAX:
+            _processed_events.popitem(last=False)
+        _processed_events[event_id] = time.monotonic()
+
+
+_PRICE_TIER_MAP: dict[str, str] | None = None
+
+
+def _price_tier_map() -> dict[str, str]:
+    """Reverse {price_id: tier} map built once from the STRIPE_PRICE_* env vars."""
+    global _PRICE_TIER_MAP
+    if _PRICE_TIER_MAP is None:
+        mapping: dict[str, str] = {}
+        for env_name, tier in (
+            ("STRIPE_PRICE_TEAM", "team"),
+            ("STRIPE_PRICE_PRO", "pro"),
+            ("STRIPE_PRICE_STARTER", "starter"),
+        ):
+            price_id = os.getenv(env_name)
+            if price_id:
+                mapping[price_id] = tier
+        _PRICE_TIER_MAP = mapping
+    return _PRICE_TIER_MAP
+
+
+def _reset_price_tier_map() -> None:
+    """Drop the memoized price map (tests / env changes)."""
+    global _PRICE_TIER_MAP
+    _PRICE_TIER_MAP = None
+
+
 def _infer_tier_from_prices(price_ids: list[str]) -> str | None:
     if not price_ids:
         return None
-    mapping = {
-        os.getenv("STRIPE_PRICE_TEAM"): "team",
-        os.getenv("STRIPE_PRICE_PRO"): "pro",
-        os.getenv("STRIPE_PRICE_STARTER"): "starter",
-    }
-    for pid in price_ids:
-        for env_pid, tier in mapping.items():
-            if env_pid and pid == env_pid:
-                return tier
-    return None
+    m = _price_tier_map()
+    return next((m[p] for p in price_ids if p in m), None)
 
 
 def _subscription_doc_id(project_id: str) -> str:
@@ -354,8 +595,11 @@ def _subscription_doc_id(project_id: str) -> str:
 def _record_subscription_state(project_id: str, tier: str, status: str, usage_item: str | None = None):  # pragma: no cover - network side effects
     # Allow explicit usage_item param; fallback to env; then previous cache value
     if not usage_item:
-        usage_item = os.getenv("STRIPE_USAGE_SUBSCRIPTION_ITEM") or _subscription_cache.get(project_id, {}).get("usage_item")
+        prev = _subscription_cache.get(project_id, _EMPTY_MAPPING)
+        usage_item = os.getenv("STRIPE_USAGE_SUBSCRIPTION_ITEM") or prev.get("usage_item")
     _subscription_cache[project_id] = {"tier": tier, "status": status}
+    _tier_cache.pop(project_id, None)
+    _sub_neg_cache.pop(project_id, None)
     if usage_item:
         _subscription_cache[project_id]["usage_item"] = usage_item
     client = _firestore_client()
@@ -366,7 +610,7 @@ def _record_subscription_state(project_id: str, tier: str, status: str, usage_it
                 "tier": tier,
                 "status": status,
                 "usage_item": _subscription_cache[project_id].get("usage_item"),
-                "updated_at": utc_now().isoformat().replace("+00:00", "Z"),
+                "updated_at": _iso_z(utc_now()),
             })
         except Exception:
             pass
@@ -375,6 +619,8 @@ def _record_subscription_state(project_id: str, tier: str, status: str, usage_it
 def _load_subscription_state(project_id: str) -> Dict[str, str] | None:
     if project_id in _subscription_cache:
         return _subscription_cache[project_id]
+    if _negative_cached(_sub_neg_cache, project_id):
+        return None
     client = _firestore_client()
     if not client:
         return None
@@ -392,50 +638,123 @@ def _load_subscription_state(project_id: str) -> Dict[str, str] | None:
                 return _subscription_cache[project_id]
     except Exception:
         return None
+    _sub_neg_cache[project_id] = time.monotonic() + NEGATIVE_CACHE_TTL_SECONDS
     return None
 
 
 # --- Metered usage (Stripe UsageRecord) -------------------------------------------
 
 def _maybe_publish_metered_usage(project_id: str, quantity: int):  # pragma: no cover - network
-    """Attempt to publish a metered usage record.
+    """Attempt to publish (or queue for coalesced publish) a metered usage record.
 
     Order of resolution for subscription item (Stripe subscription item id for usage price):
       1. In-memory subscription cache (populated by webhook or prior call) key 'usage_item'
       2. Environment variable STRIPE_USAGE_SUBSCRIPTION_ITEM (static override)
     Fails silently (logged via comment) if insufficient configuration.
+
+    Stripe increments are accumulated per subscription item and published by a
+    background flusher every ODIN_USAGE_FLUSH_SEC seconds (default 5; <= 0 publishes
+    inline) or sooner once USAGE_PUBLISH_MAX_UNITS units are pending.
     """
+    sub = _subscription_cache.get(project_id)
     # Fast path: custom test hook
-    global _usage_publisher
     if _usage_publisher:
-        item = _subscription_cache.get(project_id, {}).get("usage_item") or os.getenv("STRIPE_USAGE_SUBSCRIPTION_ITEM")
+        item = (sub and sub.get("usage_item")) or os.getenv("STRIPE_USAGE_SUBSCRIPTION_ITEM")
         if not item:
             return
-        try:
-            _usage_publisher(item, quantity, int(utc_now().timestamp()))
-        except Exception:
-            pass
+        if not _usage_publisher_batched:
+            _send_usage(item, quantity)
+            return
+    else:
+        if _LOCAL_ONLY or not stripe_configured():
+            return
+        sub = sub or _load_subscription_state(project_id)
+        item = (sub and sub.get("usage_item")) or os.getenv("STRIPE_USAGE_SUBSCRIPTION_ITEM")
+        if not item:
+            return
+    if _usage_publish_interval() <= 0:
+        _send_usage(item, quantity)
         return
+    # Coalesce: the background flusher sends one UsageRecord per item per window
+    _ensure_usage_flusher()
+    with _pending_usage_lock:
+        pending = _pending_usage.get(item, 0) + quantity
+        _pending_usage[item] = pending
+    if pending >= USAGE_PUBLISH_MAX_UNITS:
+        _usage_flush_wakeup.set()
 
-    if not stripe_configured():
-        return
-    sub_state = _subscription_cache.get(project_id) or _load_subscription_state(project_id) or {}
-    item = sub_state.get("usage_item") or os.getenv("STRIPE_USAGE_SUBSCRIPTION_ITEM")
-    if not item:
-        return
+
+def _usage_publish_interval() -> int:
+    return _env_int("ODIN_USAGE_FLUSH_SEC", USAGE_PUBLISH_INTERVAL_SECONDS)
+
+
+def _publish_usage_record(item: str, quantity: int) -> None:  # pragma: no cover - network
     try:
-        stripe.UsageRecord.create(  # type: ignore
+        _stripe().UsageRecord.create(  # type: ignore
             subscription_item=item,
             quantity=quantity,
-            timestamp=int(utc_now().timestamp()),
+            timestamp=int(time.time()),
             action="increment",
         )
     except Exception as e:
-        _logger().debug(f"UsageRecord publish failed (non-fatal): {e}")
+        _log.debug(f"UsageRecord publish failed (non-fatal): {e}")
 
-def inject_usage_publisher(fn: Callable[[str, int, int], None]):  # pragma: no cover - test helper
-    global _usage_publisher
+
+def _send_usage(item: str, quantity: int) -> None:
+    """Deliver one increment to the injected publisher if set, else to Stripe."""
+    publisher = _usage_publisher
+    if publisher is None:
+        _publish_usage_record(item, quantity)
+        return
+    try:
+        publisher(item, quantity, int(utc_now().timestamp()))
+    except Exception:
+        pass
+
+
+def flush_metered_usage() -> None:
+    """Publish all pending coalesced usage now (one UsageRecord per item)."""
+    with _pending_usage_lock:
+        pending = dict(_pending_usage)
+        _pending_usage.clear()
+    for item, quantity in pending.items():
+        if quantity > 0:
+            _send_usage(item, quantity)
+
+
+def _usage_flusher_loop() -> None:  # pragma: no cover - background thread
+    while True:
+        _usage_flush_wakeup.wait(timeout=max(_usage_publish_interval(), 1))
+        _usage_flush_wakeup.clear()
+        flush_metered_usage()
+
+
+def _ensure_usage_flusher() -> None:
+    global _usage_flusher
+    if _usage_flusher is not None:
+        return
+    with _pending_usage_lock:
+        if _usage_flusher is None:
+            _usage_flusher = threading.Thread(
+                target=_usage_flusher_loop, name="odin-usage-flusher", daemon=True
+            )
+            _usage_flusher.start()
+            atexit.register(flush_metered_usage)
+
+
+def inject_usage_publisher(
+    fn: Callable[[str, int, int], None], flush_mode: str = "immediate"
+):  # pragma: no cover - test helper
+    """Route metered increments to ``fn`` instead of Stripe.
+
+    flush_mode='immediate' calls ``fn`` once per receipt; 'batched' coalesces per
+    item like the Stripe path and calls ``fn(item, qty_sum, ts)`` on flush.
+    """
+    global _usage_publisher, _usage_publisher_batched
+    if flush_mode not in ("immediate", "batched"):
+        raise ValueError(f"unknown flush_mode: {flush_mode!r}")
     _usage_publisher = fn
+    _usage_publisher_batched = flush_mode == "batched"
 
 
 # --- Persistent webhook idempotency (Firestore) ----------------------------------
@@ -469,7 +788,7 @@ def _persist_processed_event_id(event_id: str) -> None:
     ttl_seconds = _env_int("BILLING_WEBHOOK_ID_TTL_SECONDS", 86400)  # 24h default
     now = utc_now()
     doc = {
-        "created_at": now.isoformat().replace("+00:00", "Z"),
+        "created_at": _iso_z(now),
     }
     if ttl_seconds > 0:
         try:
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 import os
+from functools import lru_cache
 from typing import Any
 
 from cryptography.hazmat.primitives import serialization
@@ -19,17 +20,19 @@ class GatewaySigner:
             raise ValueError("ODIN_GATEWAY_PRIVATE_KEY_B64 must be a 32-byte base64url seed")
         self._priv = Ed25519PrivateKey.from_private_bytes(seed)
         self._pub = self._priv.public_key()
+        # public key never changes after construction; encode the JWK once
+        pub_raw = self._pub.public_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PublicFormat.Raw,
+        )
+        self._jwk = {"kty":"OKP","crv":"Ed25519","x": b64u(pub_raw), "kid": kid, "status":"active"}
 
     def sign(self, message: bytes) -> str:
         sig = self._priv.sign(message)
         return b64u(sig)
 
     def public_jwk(self) -> dict[str, Any]:
-        pub_raw = self._pub.public_bytes(
-            encoding=serialization.Encoding.Raw,
-            format=serialization.PublicFormat.Raw,
-        )
-        return {"kty":"OKP","crv":"Ed25519","x": b64u(pub_raw), "kid": self.kid, "status":"active"}
+        return dict(self._jwk)
 
 def load_signer_from_env() -> GatewaySigner | None:
     priv = os.getenv("ODIN_GATEWAY_PRIVATE_KEY_B64")
@@ -38,16 +41,19 @@ def load_signer_from_env() -> GatewaySigner | None:
         return None
     return GatewaySigner(priv, kid)
 
+@lru_cache(maxsize=4)
+def _parse_extra(additional_json: str) -> tuple[dict[str, Any], ...]:
+    try:
+        extra = json.loads(additional_json)
+        return tuple(k for k in (extra.get("keys") or []) if isinstance(k, dict))
+    except Exception:
+        return ()
+
 def merge_jwks(active: dict[str, Any] | None, additional_json: str | None) -> dict[str, Any]:
     keys = []
     if active:
         keys.append(active)
     if additional_json:
-        try:
-            extra = json.loads(additional_json)
-            for k in (extra.get("keys") or []):
-                if isinstance(k, dict):
-                    keys.append(k)
-        except Exception:
-            pass
+        # parsed keys are cached; hand out copies so callers cannot mutate the cache
+        keys.extend(dict(k) for k in _parse_extra(additional_json))
     return {"keys": keys}
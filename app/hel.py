@@ -1,24 +1,43 @@
 from __future__ import annotations
 
 import os
+from functools import lru_cache
 from urllib.parse import urlparse
 
+# Parsed HEL_ALLOWLIST, built on first use; call refresh_allowlist() after changing the env.
+_ALLOW_SET: frozenset[str] | None = None
+
 
 def _parse_allowlist() -> list[str]:
     s = os.getenv("HEL_ALLOWLIST","").strip()
     if not s:
         return []
-    # decode any __SL__ -> '/' if caller encoded for env-var compatibility
-    s = s.replace("__SL__", "/")
-    # strip spaces and empty entries
-    items = [h.strip() for h in s.split(",") if h.strip()]
-    return items
+    # single pass: strip spaces, drop empty entries and decode any __SL__ -> '/'
+    # (callers may encode '/' that way for env-var compatibility)
+    return [h.strip().replace("__SL__", "/") for h in s.split(",") if h.strip()]
+
+def _allow_set() -> frozenset[str]:
+    global _ALLOW_SET
+    if _ALLOW_SET is None:
+        # hostnames from urlparse are lowercase; normalize entries to match
+        _ALLOW_SET = frozenset(h.lower() for h in _parse_allowlist())
+    return _ALLOW_SET
+
+def refresh_allowlist() -> None:
+    """Re-read HEL_ALLOWLIST on next check (hot reload / tests)."""
+    global _ALLOW_SET
+    _ALLOW_SET = None
+
+@lru_cache(maxsize=4096)
+def _host_of(url: str) -> str:
+    return urlparse(url).hostname or ""
 
 def check_forward_allowed(forward_url: str | None) -> tuple[bool, str]:
     if not forward_url:
         return True, "no_forward_url"
-    host = urlparse(forward_url).hostname or ""
-    allow = _parse_allowlist()
+    host = _host_of(forward_url)
+    allow = _allow_set()
     if not allow:
         return False, "deny_no_allowlist_configured"
-    return (host in allow, f"{'allowed' if host in allow else 'blocked'}:{host}")
+    allowed = host in allow
+    return (allowed, f"{'allowed' if allowed else 'blocked'}:{host}")
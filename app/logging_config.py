@@ -5,45 +5,69 @@ based on ODIN_REQUEST_LOG_JSON (shared switch for simplicity).
 """
 from __future__ import annotations
 
+import datetime
 import json
 import logging
 import os
-from typing import Optional
+from typing import Any
 
 _JSON_ENV_VALUES = {"1", "true", "yes", "on"}
 
 
+try:  # optional C-accelerated JSON encoder
+    import orjson  # type: ignore
+
+    def _dumps(obj: dict[str, Any]) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+except Exception:  # pragma: no cover - stdlib fallback
+    def _dumps(obj: dict[str, Any]) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
+
 class _JsonFormatter(logging.Formatter):  # pragma: no cover - pure formatting
     def format(self, record: logging.LogRecord) -> str:
-        base = {
-            "ts": self.formatTime(record, datefmt="%Y-%m-%dT%H:%M:%S"),
+        ts = datetime.datetime.fromtimestamp(record.created, tz=datetime.UTC)
+        return _dumps({
+            "ts": ts.isoformat(timespec="seconds"),
             "level": record.levelname,
             "logger": record.name,
             "msg": record.getMessage(),
-        }
-        return json.dumps(base, separators=(",", ":"))
+        })
+
+
+_JSON_MODE = os.getenv("ODIN_REQUEST_LOG_JSON", "false").lower() in _JSON_ENV_VALUES
+_FMT_TEXT = logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+_FMT_JSON = _JsonFormatter()
+# (level_env, default_level) -> resolved numeric level
+_LEVEL_CACHE: dict[tuple[str | None, str], int] = {}
+
+
+def _resolve_level(level_env: str | None, default_level: str) -> int:
+    key = (level_env, default_level)
+    lvl = _LEVEL_CACHE.get(key)
+    if lvl is None:
+        lvl_str = (os.getenv(level_env, default_level) if level_env else default_level).upper()
+        lvl = getattr(logging, lvl_str, logging.INFO)
+        _LEVEL_CACHE[key] = lvl
+    return lvl
 
 
 def get_logger(name: str, level_env: str | None = None, default_level: str = "INFO") -> logging.Logger:
     """Return a logger configured once.
 
+    Handler, formatter and level are resolved when the handler is first attached;
+    later calls return the configured logger without re-reading the environment.
+
     Parameters:
       name: logger name
       level_env: optional env var name containing a logging level
       default_level: fallback level if env invalid
     """
     logger = logging.getLogger(name)
-    if not logger.handlers:
-        handler = logging.StreamHandler()
-        if os.getenv("ODIN_REQUEST_LOG_JSON", "false").lower() in _JSON_ENV_VALUES:
-            handler.setFormatter(_JsonFormatter())
-        else:
-            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
-        logger.addHandler(handler)
-    # level resolution
-    if level_env:
-        lvl_str = os.getenv(level_env, default_level).upper()
-    else:
-        lvl_str = default_level.upper()
-    logger.setLevel(getattr(logging, lvl_str, logging.INFO))
+    if logger.handlers:
+        return logger
+    handler = logging.StreamHandler()
+    handler.setFormatter(_FMT_JSON if _JSON_MODE else _FMT_TEXT)
+    logger.addHandler(handler)
+    logger.setLevel(_resolve_level(level_env, default_level))
     return logger
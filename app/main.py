@@ -1,12 +1,17 @@
 from __future__ import annotations
 
-import base64
+import asyncio
 import hashlib
 import hmac
 import json
 import os
 import time
 import logging
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from threading import Lock
 from typing import Any
 
@@ -18,19 +23,57 @@ from . import billing, sft
 from .crypto import load_signer_from_env, merge_jwks
 from .hel import check_forward_allowed
 from .receipts import load_receipt_store
-from .utils import canonical_json, now_iso, sha256_cid
+from .utils import b64u_digest32, cid_of, now_iso
 from .logging_config import get_logger
 
+# simple histogram buckets in seconds
+_BUCKET_EDGES = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+class _RequestMetrics:
+    """Request count, latency sum and per-bucket (non-cumulative) counts."""
+    __slots__ = ("count", "latency_sum", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.latency_sum = 0.0
+        self.buckets = array("Q", bytes(8 * len(_BUCKET_EDGES)))
+
+
+# Recorded on the event-loop thread, so the lock is effectively uncontended; it only
+# keeps updates and /metrics snapshots consistent if another thread ever records.
+_metrics = _RequestMetrics()
 _metrics_lock = Lock()
-_metrics = {
-    "requests_total": 0,
-    # simple histogram buckets in seconds
-    "latency_buckets": {0.05:0, 0.1:0, 0.25:0, 0.5:0, 1.0:0, 2.5:0, 5.0:0, 10.0:0, float('inf'):0},
-    "latency_sum": 0.0,
-    "latency_count": 0,
-}
 
-app = FastAPI(title="ODIN Gateway Cloud Lite", version="0.1.0")
+# Shared client for forward_url POSTs so connections (and TLS sessions) are pooled.
+# Each lifespan opens its own and closes it on shutdown; see _forward_http().
+_forward_client: httpx.AsyncClient | None = None
+
+def _new_forward_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=64, max_connections=128),
+    )
+
+def _forward_http() -> httpx.AsyncClient:
+    """Current forward client; created on demand when the app runs without a lifespan."""
+    global _forward_client
+    if _forward_client is None or _forward_client.is_closed:
+        _forward_client = _new_forward_client()
+    return _forward_client
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    global _forward_client
+    client = _forward_client = _new_forward_client()
+    try:
+        yield
+    finally:
+        if _forward_client is client:
+            _forward_client = None
+        await client.aclose()
+
+app = FastAPI(title="ODIN Gateway Cloud Lite", version="0.1.0", lifespan=_lifespan)
 
 _req_logger = get_logger("odin.requests", level_env="ODIN_REQUEST_LOG_LEVEL", default_level="INFO")
 
@@ -39,49 +82,117 @@ async def _logging_middleware(request: Request, call_next):  # pragma: no cover
     start = time.perf_counter()
     try:
         response = await call_next(request)
-        duration = (time.perf_counter() - start) * 1000.0
-        trace_id = request.headers.get("X-Trace-Id") or "-"
-        _req_logger.info(f"method={request.method} path={request.url.path} status={response.status_code} dur_ms={duration:.2f} trace_id={trace_id}")
+        # skip header/url lookups entirely when INFO is filtered out
+        if _req_logger.isEnabledFor(logging.INFO):
+            duration = (time.perf_counter() - start) * 1000.0
+            trace_id = request.headers.get("X-Trace-Id") or "-"
+            _req_logger.info(
+                "method=%s path=%s status=%s dur_ms=%.2f trace_id=%s",
+                request.method, request.url.path, response.status_code, duration, trace_id,
+            )
         return response
     except Exception as e:
         duration = (time.perf_counter() - start) * 1000.0
-        _req_logger.error(f"method={request.method} path={request.url.path} error={e} dur_ms={duration:.2f}")
+        _req_logger.error(
+            "method=%s path=%s error=%s dur_ms=%.2f",
+            request.method, request.url.path, e, duration,
+        )
         raise
 
 signer = load_signer_from_env()
 billing.init_stripe()
 store = load_receipt_store()
 
+# Billing project scope; resolved once since it only changes on redeploy.
+_PROJECT_ID = (
+    os.getenv("BILLING_PROJECT_ID")
+    or os.getenv("FIRESTORE_PROJECT")
+    or "local-project"
+)
+
+@lru_cache(maxsize=4)
+def _parse_key_map(secrets_json: str) -> dict[str, bytes]:
+    """Parse ODIN_API_KEY_SECRETS once per distinct value; secrets pre-encoded for HMAC.
+
+    Keyed on the raw env string so a changed value is picked up without a restart.
+    """
+    return {k: v.encode("utf-8") for k, v in json.loads(secrets_json).items()}
+
 def _record_metrics(duration: float):
+    # first edge >= duration, i.e. the first bucket with duration <= le
+    i = bisect_left(_BUCKET_EDGES, duration)
+    with _metrics_lock:
+        _metrics.count += 1
+        _metrics.latency_sum += duration
+        _metrics.buckets[i] += 1
+
+def _metrics_snapshot() -> dict[str, Any]:
+    """Consistent copy of requests_total / latency_* totals."""
     with _metrics_lock:
-        _metrics["requests_total"] += 1
-        _metrics["latency_sum"] += duration
-        _metrics["latency_count"] += 1
-    for b in _metrics["latency_buckets"]:
-            if duration <= b:
-                _metrics["latency_buckets"][b] += 1
-                break
+        count = _metrics.count
+        latency_sum = _metrics.latency_sum
+        buckets = _metrics.buckets.tolist()
+    return {
+        "requests_total": count,
+        "latency_buckets": dict(zip(_BUCKET_EDGES, buckets)),
+        "latency_sum": latency_sum,
+        "latency_count": count,
+    }
+
+# Bucket order and labels are fixed; precompute them (and the static header) once.
+_BUCKET_ORDER = tuple(sorted(_BUCKET_EDGES))
+_BUCKET_LINE_PREFIXES = tuple(
+    "odin_request_latency_seconds_bucket{le=\""
+    + ("+Inf" if b == float("inf") else f"{b:.2f}".rstrip("0").rstrip("."))
+    + "\"} "
+    for b in _BUCKET_ORDER
+)
+_REQUESTS_HEADER = (
+    "# HELP odin_requests_total Total requests\n"
+    "# TYPE odin_requests_total counter\n"
+    "odin_requests_total "
+)
+_LATENCY_HEADER = (
+    "# HELP odin_request_latency_seconds Request latency\n"
+    "# TYPE odin_request_latency_seconds histogram"
+)
 
 def _prometheus_exposition() -> str:
-    lines = [
-        "# HELP odin_requests_total Total requests",
-        "# TYPE odin_requests_total counter",
-        f"odin_requests_total {_metrics['requests_total']}",
-        "# HELP odin_request_latency_seconds Request latency",
-        "# TYPE odin_request_latency_seconds histogram",
-    ]
+    snapshot = _metrics_snapshot()
+    buckets = snapshot["latency_buckets"]
+    lines = [f"{_REQUESTS_HEADER}{snapshot['requests_total']}", _LATENCY_HEADER]
+    append = lines.append
     # build histogram lines
     cumulative = 0
-    for b in sorted(_metrics["latency_buckets"]):
-        cumulative += _metrics["latency_buckets"][b]
-        bucket_label = (
-            "+Inf" if b == float("inf") else f"{b:.2f}".rstrip("0").rstrip(".")
-        )
-        lines.append(f"odin_request_latency_seconds_bucket{{le=\"{bucket_label}\"}} {cumulative}")
-    lines.append(f"odin_request_latency_seconds_sum {_metrics['latency_sum']}")
-    lines.append(f"odin_request_latency_seconds_count {_metrics['latency_count']}")
+    for b, prefix in zip(_BUCKET_ORDER, _BUCKET_LINE_PREFIXES):
+        cumulative += buckets[b]
+        append(f"{prefix}{cumulative}")
+    append(f"odin_request_latency_seconds_sum {snapshot['latency_sum']}")
+    append(f"odin_request_latency_seconds_count {snapshot['latency_count']}")
     return "\n".join(lines) + "\n"
 
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+# Rendered exposition reused between scrapes for ODIN_METRICS_CACHE_TTL_SECONDS
+# (default 0 = render on every scrape); counts may lag by up to the TTL.
+_METRICS_CACHE_TTL = _env_float("ODIN_METRICS_CACHE_TTL_SECONDS", 0.0)
+_metrics_cache: tuple[float, bytes] = (0.0, b"")  # (expires_at monotonic, body)
+
+def _metrics_body() -> bytes:
+    global _metrics_cache
+    if _METRICS_CACHE_TTL <= 0:
+        return _prometheus_exposition().encode()
+    now = time.monotonic()
+    expires_at, body = _metrics_cache
+    if now >= expires_at:
+        body = _prometheus_exposition().encode()
+        _metrics_cache = (now + _METRICS_CACHE_TTL, body)
+    return body
+
 class Envelope(BaseModel):
     payload: dict[str, Any]
     payload_type: str
@@ -106,8 +217,61 @@ def jwks():
     additional = os.getenv("ODIN_ADDITIONAL_PUBLIC_JWKS")
     return merge_jwks(active, additional)
 
+@lru_cache(maxsize=32)
+def _mac_prototype(secret: bytes) -> hmac.HMAC:
+    """Keyed HMAC-SHA256 to copy() per request, so key padding runs once per secret."""
+    return hmac.new(secret, digestmod=hashlib.sha256)
+
+@lru_cache(maxsize=4096)
+def _expected_mac(secret: bytes, message: bytes) -> bytes:
+    """Unpadded base64url HMAC-SHA256 of a MAC message, as ASCII bytes.
+
+    Cached so retried envelopes skip the HMAC. Keyed on the secret itself (not the
+    API key) so a rotated secret never hits.
+    """
+    mac = _mac_prototype(secret).copy()
+    mac.update(message)
+    return b64u_digest32(mac.digest()).encode("ascii")
+
+# (payload CID, payload_type, target_type) -> normalized CID for mapped pairs, so a
+# retried envelope skips both the SFT transform and canonicalizing its output.
+_NORMALIZED_CID_MAX = 1024
+_normalized_cids: OrderedDict[tuple[str, str, str], str] = OrderedDict()
+
+def _normalize(env: Envelope) -> dict[str, Any]:
+    # defensive error handling (prevents stray partial try blocks)
+    try:
+        return sft.normalize(env.payload, env.payload_type, env.target_type)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Normalization failed: {e}")
+
+def _normalized_cid(env: Envelope) -> tuple[dict[str, Any] | None, str]:
+    """Normalized payload (None when cached and not needed) and its CID."""
+    if not sft.has_mapping(env.payload_type, env.target_type):
+        # passthrough: the normalized payload is the payload itself
+        return env.payload, cid_of(env.payload)
+    key = (cid_of(env.payload), env.payload_type, env.target_type)
+    cid = _normalized_cids.get(key)
+    if cid is not None:
+        _normalized_cids.move_to_end(key)
+        # forwarding still needs the normalized body
+        return (_normalize(env) if env.forward_url else None), cid
+    normalized = _normalize(env)
+    cid = cid_of(normalized)
+    _normalized_cids[key] = cid
+    if len(_normalized_cids) > _NORMALIZED_CID_MAX:
+        _normalized_cids.popitem(last=False)
+    return normalized, cid
+
+def _commit_receipt(project_id: str, receipt: dict[str, Any]) -> dict[str, Any]:
+    """Quota check, receipt persistence and usage accounting (blocking I/O)."""
+    billing.enforce_quota(project_id)
+    receipt = store.add(receipt)
+    billing.record_receipt(project_id, metered=True)
+    return receipt
+
 @app.post("/v1/odin/envelope")
-def handle_envelope(
+async def handle_envelope(
     env: Envelope,
     response: Response,
     request: Request,
@@ -115,12 +279,8 @@ def handle_envelope(
     x_odin_api_mac: str | None = Header(default=None),
 ):
     start = time.perf_counter()
-    # Normalize payload via SFT with defensive error handling (prevents stray partial try blocks)
-    try:
-        normalized = sft.normalize(env.payload, env.payload_type, env.target_type)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Normalization failed: {e}")
-    normalized_cid = sha256_cid(canonical_json(normalized))
+    # Normalize payload via SFT (cached by payload CID for mapped type pairs)
+    normalized, normalized_cid = _normalized_cid(env)
 
     # policy check for forward_url (HEL)
     allowed, reason = check_forward_allowed(env.forward_url)
@@ -133,7 +293,7 @@ def handle_envelope(
     secrets_json = os.getenv("ODIN_API_KEY_SECRETS")
     if secrets_json:
         try:
-            key_map = json.loads(secrets_json)
+            key_map = _parse_key_map(secrets_json)
         except Exception:
             raise HTTPException(status_code=500, detail="Server key config invalid")
         if not x_odin_api_key or not x_odin_api_mac:
@@ -142,19 +302,13 @@ def handle_envelope(
         if not secret:
             raise HTTPException(status_code=401, detail="Unknown API key")
         mac_message = f"{normalized_cid}|{trace_id}|{ts}".encode()
-        expected = base64.urlsafe_b64encode(
-            hmac.new(secret.encode("utf-8"), mac_message, hashlib.sha256).digest()
-        ).decode("ascii").rstrip("=")
-        if not hmac.compare_digest(expected, x_odin_api_mac):
+        expected = _expected_mac(secret, mac_message)
+        # exact 43-char string compare: no lenient decoding of padding, alphabet or spare bits
+        if not hmac.compare_digest(expected, x_odin_api_mac.encode("utf-8", "replace")):
             raise HTTPException(status_code=401, detail="Invalid MAC")
 
     # Billing / quota enforcement (project scoped)
-    project_id = (
-        os.getenv("BILLING_PROJECT_ID")
-        or os.getenv("FIRESTORE_PROJECT")
-        or "local-project"
-    )
-    billing.enforce_quota(project_id)
+    project_id = _PROJECT_ID
 
     # Build receipt (only for authorized requests)
     receipt = {
@@ -167,8 +321,8 @@ def handle_envelope(
         "normalized_cid": normalized_cid,
         "policy": {"engine": "HEL", "allowed": allowed, "reason": reason},
     }
-    receipt = store.add(receipt)
-    billing.record_receipt(project_id, metered=True)
+    # file/Firestore writes and billing lookups block; keep them off the event loop
+    receipt = await asyncio.to_thread(_commit_receipt, project_id, receipt)
 
     # (Optional) forward step (no body on failure in lite mode)
     forwarded = None
@@ -176,9 +330,8 @@ def handle_envelope(
         if not allowed:
             raise HTTPException(status_code=403, detail=f"Forward blocked by HEL: {reason}")
         try:
-            with httpx.Client(timeout=10.0) as client:
-                fresp = client.post(env.forward_url, json=normalized)
-                forwarded = {"status_code": fresp.status_code}
+            fresp = await _forward_http().post(env.forward_url, json=normalized)
+            forwarded = {"status_code": fresp.status_code}
         except Exception as e:
             forwarded = {"error": str(e)}
 
@@ -188,7 +341,7 @@ def handle_envelope(
         "receipt": receipt,
         "forwarded": forwarded,
     }
-    resp_cid = sha256_cid(canonical_json(response_body))
+    resp_cid = cid_of(response_body)
     response.headers["X-ODIN-Response-CID"] = resp_cid
     if signer:
         msg = f"{resp_cid}|{trace_id}|{ts}".encode()
@@ -201,7 +354,7 @@ def handle_envelope(
 
 @app.get("/metrics")
 def metrics():
-    return Response(content=_prometheus_exposition(), media_type="text/plain; version=0.0.4")
+    return Response(content=_metrics_body(), media_type="text/plain; version=0.0.4")
 
 @app.get("/v1/receipts/hops/chain/{trace_id}")
 def get_chain(trace_id: str):
@@ -211,7 +364,7 @@ def get_chain(trace_id: str):
 def export_bundle(trace_id: str, response: Response):
     chain = store.chain(trace_id)
     bundle = {"trace_id": trace_id, "chain": chain, "exported_at": now_iso()}
-    bundle_cid = sha256_cid(canonical_json(bundle))
+    bundle_cid = cid_of(bundle)
     response.headers["X-ODIN-Response-CID"] = bundle_cid
     if signer:
         msg = f"{bundle_cid}|{trace_id}|{bundle['exported_at']}".encode()
@@ -230,7 +383,7 @@ def _require_api_key(x_odin_api_key: str | None):
     if not x_odin_api_key:
         raise HTTPException(status_code=401, detail="Missing API key")
     try:
-        key_map = json.loads(secrets_json)
+        key_map = _parse_key_map(secrets_json)
     except Exception:
         raise HTTPException(status_code=500, detail="Server key config invalid")
     if x_odin_api_key not in key_map:
@@ -240,11 +393,7 @@ def _require_api_key(x_odin_api_key: str | None):
 @app.get("/v1/billing/usage")
 def billing_usage(x_odin_api_key: str | None = Header(default=None)):
     _require_api_key(x_odin_api_key)
-    project_id = (
-        os.getenv("BILLING_PROJECT_ID")
-        or os.getenv("FIRESTORE_PROJECT")
-        or "local-project"
-    )
+    project_id = _PROJECT_ID
     return billing.usage_summary(project_id)
 
 
@@ -252,11 +401,7 @@ def billing_usage(x_odin_api_key: str | None = Header(default=None)):
 def billing_tier(x_odin_api_key: str | None = Header(default=None)):
     """Lightweight tier introspection (auth required if API keys configured)."""
     _require_api_key(x_odin_api_key)
-    project_id = (
-        os.getenv("BILLING_PROJECT_ID")
-        or os.getenv("FIRESTORE_PROJECT")
-        or "local-project"
-    )
+    project_id = _PROJECT_ID
     tier = billing.configured_tier(project_id)
     return {"project_id": project_id, "tier": tier, "limit": billing.free_tier_limit() if tier == "free" else None}
 
@@ -272,11 +417,7 @@ def create_checkout(req: CheckoutRequest, x_odin_api_key: str | None = Header(de
     _require_api_key(x_odin_api_key)
     if not billing.stripe_configured():
         raise HTTPException(status_code=400, detail="Stripe not configured")
-    project_id = (
-        os.getenv("BILLING_PROJECT_ID")
-        or os.getenv("FIRESTORE_PROJECT")
-        or "local-project"
-    )
+    project_id = _PROJECT_ID
     try:
         session = billing.create_checkout_session(
             project_id=project_id,
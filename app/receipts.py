@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+import atexit
 import datetime
 import json
 import os
-from typing import Any
+import threading
+import time
+from bisect import insort
+from collections import OrderedDict
+from typing import Any, BinaryIO
 
-from .utils import canonical_json, sha256_cid
+from .utils import cid_of, json_loads
 
 # Optional Firestore support (lazy import)
 _firestore_unavailable_reason: str | None = None
@@ -15,7 +20,48 @@ try:
 except Exception as e:  # pragma: no cover - import guard
     _firestore_unavailable_reason = str(e)
 
+# Age-based retention is applied by periodic compaction instead of on every write.
+PRUNE_EVERY_INSERTS = 1000
+
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+def _chain_order(r: dict[str, Any]) -> tuple[Any, Any]:
+    """Chain ordering: by hop, then ts."""
+    return (r.get("hop", 0), r.get("ts", ""))
+
+
+def _receipt_hash(r: dict[str, Any]) -> str:
+    """Receipt hash over every field except 'receipt_hash' itself."""
+    if "receipt_hash" not in r:
+        return cid_of(r)  # common case: nothing to exclude, skip the filtered copy
+    return cid_of({k: v for k, v in r.items() if k != "receipt_hash"})
+
+
 class ReceiptStore:
+    """Append-only JSONL receipt store.
+
+    One scan at startup loads the last receipt hash and a trace_id -> receipts
+    index; both are maintained on add(), so each add appends a single line and
+    chain() is usually served from memory in O(k) for a k-hop trace.
+
+    Several processes may share the file (e.g. uvicorn --workers > 1): add() and
+    chain() stat the log first, read lines appended by other writers since the
+    last look, and rescan a log that was rewritten or truncated. Appends are not
+    locked across processes, so writers adding at the same instant can still link
+    to the same tail. ODIN_RECEIPT_WRITE_BUFFERED skips the check and assumes a
+    single writer.
+
+    The index keeps the ODIN_RECEIPT_INDEX_MAX_TRACES (default 10000, 0 = no
+    limit) most recently used traces; chain() for an evicted trace reads the log.
+
+    With a retention window set, the log is compacted (rewritten without expired
+    receipts) every PRUNE_EVERY_INSERTS adds or once per max_age_seconds.
+
+    The log is written through one persistent append handle. Each add is flushed
+    to the OS unless ODIN_RECEIPT_WRITE_BUFFERED is set, in which case lines are
+    buffered (64 KiB) and flushed on chain(), flush(), close() or interpreter exit.
+    """
     def __init__(self, path: str | None = None, max_age_seconds: int | None = None):
         self.path = path or os.getenv("ODIN_LOCAL_RECEIPTS") or "receipts.log.jsonl"
         try:
@@ -23,6 +69,111 @@ class ReceiptStore:
             self.max_age_seconds = int(env_val or (max_age_seconds or 0))
         except Exception:
             self.max_age_seconds = 0
+        try:
+            self.max_index_traces = int(os.getenv("ODIN_RECEIPT_INDEX_MAX_TRACES", "10000"))
+        except Exception:
+            self.max_index_traces = 10000
+        self._lock = threading.Lock()
+        self._last_hash: str | None = None
+        # trace_id -> chain-ordered receipts, least recently used first
+        self._by_trace: OrderedDict[str, list[dict[str, Any]]] = OrderedDict()
+        self._evicted = False  # some trace has been dropped from the index
+        self._partial: set[str] = set()  # indexed after an eviction: may lack older hops
+        self._needs_newline = False  # file does not end with a newline
+        self._size = 0  # bytes of the log already indexed
+        self._ino: int | None = None  # inode of the indexed log, to spot a rewrite
+        self._inserts_since_prune = 0
+        self._last_prune = time.monotonic()
+        self._buffered = os.getenv("ODIN_RECEIPT_WRITE_BUFFERED", "").lower() in _TRUE_VALUES
+        self._fh: BinaryIO | None = None
+        self._close_at_exit = False
+        self._scan()
+
+    def _scan(self) -> None:
+        """(Re)build tail hash and trace index from the file."""
+        self._last_hash = None
+        self._by_trace = OrderedDict()
+        self._evicted = False
+        self._partial = set()
+        self._needs_newline = False
+        self._size = 0
+        self._ino = None
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            self._ino = os.fstat(f.fileno()).st_ino
+            self._consume(f)
+
+    def _consume(self, f: BinaryIO) -> None:
+        """Index every line from the handle's position to end of file."""
+        for raw in f:
+            self._size += len(raw)
+            self._needs_newline = not raw.endswith(b"\n")
+            if not raw.strip():
+                continue
+            try:
+                obj = json_loads(raw)
+            except Exception:
+                continue
+            if isinstance(obj, dict):  # skip valid JSON that is not a receipt
+                self._index(obj)
+
+    def _sync(self) -> None:
+        """Catch up with lines other writers appended, or rescan a rewritten log."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            if self._ino is not None:  # removed underneath us
+                self._close_handle()
+                self._scan()
+            return
+        if st.st_ino != self._ino or st.st_size < self._size:
+            self._close_handle()  # our append handle may point at the replaced file
+            self._scan()
+        elif st.st_size > self._size:
+            with open(self.path, "rb") as f:
+                f.seek(self._size)
+                self._consume(f)
+
+    def _index(self, obj: dict[str, Any]) -> None:
+        self._last_hash = obj.get("receipt_hash")
+        trace_id = obj.get("trace_id")
+        if trace_id is None:
+            return
+        chain = self._by_trace.get(trace_id)
+        if chain is None:
+            chain = self._by_trace[trace_id] = []
+            if self._evicted:
+                # earlier hops may have been evicted; chain() re-reads it from the log
+                self._partial.add(trace_id)
+            self._evict_over_limit()
+        else:
+            self._by_trace.move_to_end(trace_id)
+        # keep each trace's list in chain order so chain() is a plain copy
+        insort(chain, obj, key=_chain_order)
+
+    def _evict_over_limit(self) -> None:
+        if self.max_index_traces <= 0:
+            return
+        while len(self._by_trace) > self.max_index_traces:
+            trace_id, _ = self._by_trace.popitem(last=False)
+            self._partial.discard(trace_id)
+            self._evicted = True
+
+    def _read_trace(self, trace_id: str) -> list[dict[str, Any]]:
+        out: list[dict[str, Any]] = []
+        if not os.path.exists(self.path):
+            return out
+        with open(self.path, "rb") as f:
+            for raw in f:
+                try:
+                    obj = json_loads(raw)
+                except Exception:
+                    continue
+                if isinstance(obj, dict) and obj.get("trace_id") == trace_id:
+                    out.append(obj)
+        out.sort(key=_chain_order)
+        return out
 
     def _read_lines(self) -> list[str]:
         try:
@@ -32,8 +183,11 @@ class ReceiptStore:
             return []
 
     def _write_lines(self, lines: list[str]) -> None:
-        with open(self.path, "w", encoding="utf-8", newline="\n") as f:
+        # write aside and swap in: the new inode tells other writers to rescan
+        tmp = f"{self.path}.tmp{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
             f.write("\n".join(lines) + ("\n" if lines else ""))
+        os.replace(tmp, self.path)
 
     def _prune_by_age(self, lines: list[str]) -> list[str]:
         if not self.max_age_seconds or self.max_age_seconds <= 0:
@@ -44,7 +198,7 @@ class ReceiptStore:
         kept: list[str] = []
         for ln in lines:
             try:
-                obj = json.loads(ln)
+                obj = json_loads(ln)
                 ts = datetime.datetime.fromisoformat(obj.get("ts"))
                 if ts >= cutoff:
                     kept.append(ln)
@@ -52,35 +206,97 @@ class ReceiptStore:
                 kept.append(ln)
         return kept
 
-    def add(self, r: dict[str, Any]) -> dict[str, Any]:
+    def _maybe_compact(self) -> None:
+        if not self.max_age_seconds or self.max_age_seconds <= 0:
+            return
+        self._inserts_since_prune += 1
+        if (
+            self._inserts_since_prune < PRUNE_EVERY_INSERTS
+            and time.monotonic() - self._last_prune < self.max_age_seconds
+        ):
+            return
+        self._inserts_since_prune = 0
+        self._last_prune = time.monotonic()
+        self._close_handle()
         lines = self._read_lines()
-        # prune before append
-        lines = self._prune_by_age(lines)
-        # compute receipt hash and link
-        prev_hash = json.loads(lines[-1]).get("receipt_hash") if lines else None
-        r2 = dict(r)
-        r2["prev_receipt_hash"] = prev_hash
-        # receipt hash excludes 'receipt_hash' field itself
-        rh = sha256_cid(
-            canonical_json({k: v for k, v in r2.items() if k != "receipt_hash"})
-        )
-        r2["receipt_hash"] = rh
-        lines.append(json.dumps(r2, ensure_ascii=False))
-        self._write_lines(lines)
-        return r2
+        kept = self._prune_by_age(lines)
+        if len(kept) != len(lines):
+            self._write_lines(kept)
+            self._scan()
+
+    def _handle(self) -> BinaryIO:
+        if self._fh is None:
+            if not self._close_at_exit:
+                atexit.register(self.close)  # flush buffered lines on shutdown
+                self._close_at_exit = True
+            self._fh = open(self.path, "ab", buffering=65536)  # noqa: SIM115 - long-lived handle
+            self._ino = os.fstat(self._fh.fileno()).st_ino
+        return self._fh
+
+    def _close_handle(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def flush(self) -> None:
+        """Push buffered receipt lines to the OS."""
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_handle()
+
+    def add(self, r: dict[str, Any]) -> dict[str, Any]:
+        with self._lock:
+            if not self._buffered:
+                self._sync()
+            # prune (periodically) before append
+            self._maybe_compact()
+            # compute receipt hash and link to the in-memory tail
+            r2 = dict(r)
+            r2["prev_receipt_hash"] = self._last_hash
+            # receipt hash excludes 'receipt_hash' field itself
+            r2["receipt_hash"] = _receipt_hash(r2)
+            line = (json.dumps(r2, ensure_ascii=False) + "\n").encode("utf-8")
+            if self._needs_newline:
+                line = b"\n" + line
+                self._needs_newline = False
+            f = self._handle()
+            f.write(line)
+            if self._buffered:
+                self._size += len(line)
+            else:
+                f.flush()
+                if f.tell() - len(line) != self._size:
+                    # another writer appended between our stat and write: re-read
+                    self._scan()
+                    return r2
+                self._size += len(line)
+            self._index(r2)
+            return r2
 
     def chain(self, trace_id: str) -> list[dict[str, Any]]:
-        out: list[dict[str, Any]] = []
-        for ln in self._read_lines():
-            try:
-                obj = json.loads(ln)
-                if obj.get("trace_id") == trace_id:
-                    out.append(obj)
-            except Exception:
-                continue
-        # order by hop or ts then return
-        out.sort(key=lambda x: (x.get("hop", 0), x.get("ts", "")))
-        return out
+        with self._lock:
+            if not self._buffered:
+                self._sync()
+            elif self._fh is not None:
+                self._fh.flush()  # keep the file in step with what we serve
+            chain = self._by_trace.get(trace_id)
+            if chain is not None and trace_id not in self._partial:
+                self._by_trace.move_to_end(trace_id)
+                return list(chain)
+            if not self._evicted:
+                return []
+            # evicted (or indexed only after an eviction): read it from the log
+            chain = self._read_trace(trace_id)
+            if chain:
+                self._by_trace[trace_id] = chain
+                self._by_trace.move_to_end(trace_id)
+                self._partial.discard(trace_id)
+                self._evict_over_limit()
+            return list(chain)
 
 
 class FirestoreReceiptStore:
@@ -92,8 +308,16 @@ class FirestoreReceiptStore:
 
     We keep the same receipt hash linking semantics as file store. For efficiency
     we just fetch the last receipt to compute prev hash (ordered by created ts) and
-    query by trace_id for chains.
+    query by trace_id for chains. Optionally (ODIN_RECEIPT_TAIL_TTL_SECONDS > 0;
+    default 0 = always query) the hash of our own last write is reused as the tail
+    for that many seconds so a busy instance does not query it on every add. With
+    several writers that forks the chain: receipts other instances stored within
+    the window are not linked.
     """
+    # (receipt_hash, monotonic write time) of the last receipt this instance added
+    _tail: tuple[str, float] | None = None
+    tail_ttl_seconds: float = 0.0
+
     def __init__(self, project_id: str, collection: str = "receipts"):
         if _firestore_unavailable_reason:
             raise RuntimeError(f"Firestore not available: {_firestore_unavailable_reason}")
@@ -101,15 +325,20 @@ class FirestoreReceiptStore:
         self.client = firestore.Client(project=project_id)  # type: ignore
         self.collection = collection
         self.path = f"firestore://{project_id}/{collection}"  # mimic file path attr
+        try:
+            self.tail_ttl_seconds = float(os.getenv("ODIN_RECEIPT_TAIL_TTL_SECONDS", "0"))
+        except Exception:  # pragma: no cover - fallback
+            self.tail_ttl_seconds = 0.0
 
     def _collection(self):  # small indirection for tests/mocking
         return self.client.collection(self.collection)
 
     def _latest_receipt_hash(self) -> str | None:
         try:
-            # fetch latest by ts descending, limit 1
+            # fetch latest by ts descending, limit 1; only its hash is needed
             query = (
                 self._collection()
+                .select(["receipt_hash"])
                 .order_by("ts", direction=firestore.Query.DESCENDING)
                 .limit(1)
             )
@@ -120,26 +349,43 @@ class FirestoreReceiptStore:
             return None
         return None
 
+    def _cached_tail(self) -> str | None:
+        tail = self._tail
+        if tail is None or self.tail_ttl_seconds <= 0:
+            return None
+        receipt_hash, written = tail
+        if time.monotonic() - written > self.tail_ttl_seconds:
+            return None
+        return receipt_hash
+
     def add(self, r: dict[str, Any]) -> dict[str, Any]:
-        prev_hash = self._latest_receipt_hash()
+        prev_hash = self._cached_tail()
+        if prev_hash is None:
+            prev_hash = self._latest_receipt_hash()
         r2 = dict(r)
         r2["prev_receipt_hash"] = prev_hash
-        rh = sha256_cid(canonical_json({k: v for k, v in r2.items() if k != "receipt_hash"}))
-        r2["receipt_hash"] = rh
+        r2["receipt_hash"] = _receipt_hash(r2)
         try:
             self._collection().add(r2)
         except Exception as e:  # pragma: no cover
             raise RuntimeError(f"Failed to add receipt to Firestore: {e}")
+        self._tail = (r2["receipt_hash"], time.monotonic())
         return r2
 
     def chain(self, trace_id: str) -> list[dict[str, Any]]:
+        q = self._collection().where("trace_id", "==", trace_id)
+        try:
+            # served pre-sorted; needs the composite index (trace_id, hop, ts)
+            ordered = q.order_by("hop").order_by("ts")
+            return [d.to_dict() for d in ordered.stream()]
+        except Exception:
+            pass
+        # index missing (FailedPrecondition) or query error: unordered query + local sort
         try:
-            q = self._collection().where("trace_id", "==", trace_id)
-            docs = list(q.stream())
-            out = [d.to_dict() for d in docs]
+            out = [d.to_dict() for d in q.stream()]
         except Exception:
             out = []
-        out.sort(key=lambda x: (x.get("hop", 0), x.get("ts", "")))
+        out.sort(key=_chain_order)
         return out
 
 
@@ -153,7 +399,7 @@ def load_receipt_store() -> ReceiptStore | FirestoreReceiptStore:
             return ReceiptStore()
     base_store: ReceiptStore | FirestoreReceiptStore = ReceiptStore()
     # Optional caching wrapper
-    if os.getenv("ODIN_RECEIPT_CACHE", "").lower() in {"1", "true", "yes", "on"}:
+    if os.getenv("ODIN_RECEIPT_CACHE", "").lower() in _TRUE_VALUES:
         try:
             return CachingReceiptStore(base_store)
         except Exception:  # pragma: no cover - cache init should not break core path
@@ -188,54 +434,65 @@ class CachingReceiptStore:
             self.max_size = int(os.getenv("ODIN_RECEIPT_CACHE_SIZE", "1000"))
         except Exception:  # pragma: no cover
             self.max_size = 1000
-        self._by_trace: dict[str, dict[str, Any]] = {}
-        # maps trace_id -> list[receipt]
-        self._chains: dict[str, list[dict[str, Any]]] = {}
-        self._last_refresh: dict[str, datetime.datetime] = {}
+        # trace_id -> (monotonic refresh time, chain); kept in refresh order so the
+        # least recently refreshed trace is always first (O(1) eviction)
+        self._chains: OrderedDict[str, tuple[float, list[dict[str, Any]]]] = OrderedDict()
         self._total_cached = 0
+        self._lock = threading.Lock()
 
-    def _expired(self, trace_id: str) -> bool:
-        ts = self._last_refresh.get(trace_id)
-        if not ts:
-            return True
-        if self.ttl_seconds <= 0:
-            return False
-        return (datetime.datetime.now(datetime.UTC) - ts).total_seconds() > self.ttl_seconds
+    def _fresh(self, trace_id: str) -> list[dict[str, Any]] | None:
+        entry = self._chains.get(trace_id)
+        if entry is None:
+            return None
+        refreshed, chain = entry
+        if self.ttl_seconds > 0 and time.monotonic() - refreshed > self.ttl_seconds:
+            return None
+        return chain
+
+    def _drop(self, trace_id: str) -> None:
+        entry = self._chains.pop(trace_id, None)
+        if entry is not None:
+            self._total_cached -= len(entry[1])
 
     def _enforce_size(self) -> None:
         if self.max_size <= 0:
             return
-        if self._total_cached <= self.max_size:
-            return
-        # simple LRU-ish eviction based on oldest refresh time
-        ordered = sorted(self._last_refresh.items(), key=lambda x: x[1])
-        for trace_id, _ in ordered:
-            removed = len(self._chains.get(trace_id, []))
-            self._chains.pop(trace_id, None)
-            self._last_refresh.pop(trace_id, None)
-            self._total_cached -= removed
-            if self._total_cached <= self.max_size:
-                break
+        # evict least recently refreshed traces first
+        while self._total_cached > self.max_size and self._chains:
+            _, (_, chain) = self._chains.popitem(last=False)
+            self._total_cached -= len(chain)
 
     # Public API mirrors underlying subset
     def add(self, r: dict[str, Any]) -> dict[str, Any]:  # type: ignore[override]
         added = getattr(self.store, "add")(r)
         trace_id = added.get("trace_id")
         if trace_id:
-            # invalidate chain cache for this trace_id to rebuild lazily
-            self._chains.pop(trace_id, None)
-            self._last_refresh.pop(trace_id, None)
+            with self._lock:
+                cached = self._fresh(trace_id)
+                if cached is None:
+                    # nothing fresh cached for this trace_id; rebuild lazily
+                    self._drop(trace_id)
+                else:
+                    # extend the cached chain instead of re-reading the backing store
+                    chain = list(cached)
+                    insort(chain, added, key=_chain_order)
+                    refreshed = self._chains[trace_id][0]
+                    self._chains[trace_id] = (refreshed, chain)
+                    self._total_cached += 1
+                    self._enforce_size()
         return added
 
     def chain(self, trace_id: str) -> list[dict[str, Any]]:  # type: ignore[override]
-        if trace_id in self._chains and not self._expired(trace_id):
-            return self._chains[trace_id]
+        with self._lock:
+            cached = self._fresh(trace_id)
+        if cached is not None:
+            return cached
         fresh = getattr(self.store, "chain")(trace_id)
-        self._chains[trace_id] = fresh
-        self._last_refresh[trace_id] = datetime.datetime.now(datetime.UTC)
-        # recompute total
-        self._total_cached = sum(len(v) for v in self._chains.values())
-        self._enforce_size()
+        with self._lock:
+            self._drop(trace_id)
+            self._chains[trace_id] = (time.monotonic(), fresh)
+            self._total_cached += len(fresh)
+            self._enforce_size()
         return fresh
 
     # For transparency/debug
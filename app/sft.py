@@ -12,31 +12,37 @@ We only map a handful of common invoice fields for demonstration.
 """
 
 
+def _first(get, names: tuple[str, ...]) -> Any:
+    """First non-None value among ``names`` via a bound ``dict.get``."""
+    for n in names:
+        v = get(n)
+        if v is not None:
+            return v
+    return None
+
+
 def _to_iso20022_invoice(payload: dict[str, Any]) -> dict[str, Any]:
     # canonical field extraction with flexible aliases
-    def first(*names: str):
-        for n in names:
-            if n in payload and payload[n] is not None:
-                return payload[n]
-        return None
-
-    total = first("total", "amount_total", "gross_amount", "amount")
-    currency = first("currency", "ccy", "iso_currency") or "USD"
-    invoice_id = first("invoice_id", "id", "number")
-    supplier = first("supplier", "vendor", "from")
-    customer = first("customer", "to", "recipient")
-    issue_date = first("issue_date", "date", "created_at")
-
-    lines = payload.get("lines") or payload.get("items") or []
+    get = payload.get
+    total = _first(get, ("total", "amount_total", "gross_amount", "amount"))
+    currency = _first(get, ("currency", "ccy", "iso_currency")) or "USD"
+    invoice_id = _first(get, ("invoice_id", "id", "number"))
+    supplier = _first(get, ("supplier", "vendor", "from"))
+    customer = _first(get, ("customer", "to", "recipient"))
+    issue_date = _first(get, ("issue_date", "date", "created_at"))
+
+    lines = get("lines") or get("items") or []
     norm_lines = []
+    append = norm_lines.append
     for ln in lines:
         if not isinstance(ln, dict):
             continue
-        norm_lines.append({
-            "description": ln.get("description") or ln.get("name"),
-            "quantity": ln.get("quantity") or ln.get("qty") or 1,
-            "unit_price": ln.get("unit_price") or ln.get("price") or ln.get("unitPrice"),
-            "total": ln.get("total") or ln.get("line_total") or ln.get("amount"),
+        g = ln.get
+        append({
+            "description": g("description") or g("name"),
+            "quantity": g("quantity") or g("qty") or 1,
+            "unit_price": g("unit_price") or g("price") or g("unitPrice"),
+            "total": g("total") or g("line_total") or g("amount"),
         })
 
     return {
@@ -52,11 +58,22 @@ def _to_iso20022_invoice(payload: dict[str, Any]) -> dict[str, Any]:
     }
 
 
+# (payload_type, target_type) -> normalizer; any other pair passes through unchanged.
+# Identity pairs (payload_type == target_type) never get an entry.
+_NORMALIZERS = {
+    ("openai.tooluse.invoice.v1", "invoice.iso20022.v1"): _to_iso20022_invoice,
+    ("invoice.vendor.v1", "invoice.iso20022.v1"): _to_iso20022_invoice,
+}
+
+
 def normalize(payload: dict[str, Any], payload_type: str, target_type: str) -> dict[str, Any]:
-    if target_type == "invoice.iso20022.v1" and payload_type in (
-        "openai.tooluse.invoice.v1",
-        "invoice.vendor.v1",
-    ):
-        return _to_iso20022_invoice(payload)
+    if payload_type == target_type:  # common passthrough: skip the table lookup
+        return payload
+    fn = _NORMALIZERS.get((payload_type, target_type))
     # identity fallback
-    return payload
+    return fn(payload) if fn is not None else payload
+
+
+def has_mapping(payload_type: str, target_type: str) -> bool:
+    """True when normalize() transforms this pair (otherwise it returns the payload)."""
+    return (payload_type, target_type) in _NORMALIZERS
@@ -1,14 +1,34 @@
 from __future__ import annotations
 
 import base64
-import datetime
+import binascii
 import hashlib
 import json
+import re
+import time
 from typing import Any
 
+try:  # optional C-accelerated encoder; output must stay byte-identical to stdlib
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover - stdlib only
+    orjson = None
 
-def canonical_json(obj: Any) -> bytes:
-    """Return canonical JSON bytes (sorted keys, compact separators)."""
+# datetime/dataclass/str-subclass values raise instead of using orjson's own encoding
+_ORJSON_OPTS = (
+    orjson.OPT_SORT_KEYS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+    | orjson.OPT_PASSTHROUGH_SUBCLASS
+    if orjson is not None
+    else 0
+)
+# orjson formats floats differently from repr() (1e16 vs 1e+16, 0.00005 vs 5e-05)
+# and writes NaN/Infinity as null; when a float or null may be present re-encode
+# with stdlib so CIDs do not change. orjson always writes a float with '.' or 'e'.
+_ORJSON_FLOAT = re.compile(rb"[:,\[]-?\d+[.eE]")
+
+
+def _canonical_json_std(obj: Any) -> bytes:
     return json.dumps(
         obj,
         sort_keys=True,
@@ -16,15 +36,67 @@ def canonical_json(obj: Any) -> bytes:
         separators=(",", ":"),
     ).encode("utf-8")
 
+def canonical_json(obj: Any) -> bytes:
+    """Return canonical JSON bytes (sorted keys, compact separators)."""
+    if orjson is not None:
+        try:
+            out = orjson.dumps(obj, option=_ORJSON_OPTS)
+        except TypeError:  # non-str keys, >64-bit ints, unsupported types
+            return _canonical_json_std(obj)
+        if (
+            b"null" not in out
+            and out[:1] not in b"-0123456789"
+            and _ORJSON_FLOAT.search(out) is None
+        ):
+            return out
+    return _canonical_json_std(obj)
+
+def json_loads(data: str | bytes) -> Any:
+    """Parse JSON, using orjson when available."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:  # NaN/Infinity, >64-bit ints: stdlib accepts them
+            pass
+    return json.loads(data)
+
+# Pristine SHA-256 state, copied per hash: copy() is measurably cheaper than building a
+# new context for these short inputs. hashlib dispatches to OpenSSL (SHA-NI if present).
+_SHA256_PROTO = hashlib.sha256()
+
 def sha256_cid(data: bytes) -> str:
-    return "sha256:" + hashlib.sha256(data).hexdigest()
+    h = _SHA256_PROTO.copy()
+    h.update(data)
+    return "sha256:" + h.hexdigest()
+
+def cid_of(obj: Any) -> str:
+    """CID of an object's canonical JSON (sha256_cid(canonical_json(obj)))."""
+    h = _SHA256_PROTO.copy()
+    h.update(canonical_json(obj))
+    return "sha256:" + h.hexdigest()
+
+# (epoch second, "YYYY-MM-DDTHH:MM:SS.") so now_iso() formats the date part once per second
+_now_prefix: tuple[int, str] = (-1, "")
 
 def now_iso() -> str:
-    return datetime.datetime.now(datetime.UTC).isoformat()
+    """Current UTC time as ISO-8601 with microseconds and +00:00 offset."""
+    global _now_prefix
+    sec, ns = divmod(time.time_ns(), 1_000_000_000)
+    cached_sec, prefix = _now_prefix
+    if sec != cached_sec:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S.", time.gmtime(sec))
+        _now_prefix = (sec, prefix)
+    return f"{prefix}{ns // 1000:06d}+00:00"
 
 def b64u(data: bytes) -> str:
     return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
 
+_B64_URLSAFE = bytes.maketrans(b"+/", b"-_")
+
+def b64u_digest32(digest: bytes) -> str:
+    """b64u() of a 32-byte digest: always 43 chars unpadded, so slice instead of strip."""
+    return binascii.b2a_base64(digest, newline=False)[:43].translate(_B64_URLSAFE).decode("ascii")
+
 def b64u_decode(s: str) -> bytes:
     pad = "=" * (-len(s) % 4)
     return base64.urlsafe_b64decode(s + pad)
@@ -14,16 +14,13 @@ Steps performed:
 
 Prints JSON with fields: cid, trace, ts, mac.
 """
-import argparse, json, sys, time, hmac, hashlib, base64, datetime
+import argparse, json, sys, time, hmac, datetime
 from pathlib import Path
 
 # Local imports assuming run from repo root
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 from app import sft  # noqa: E402
-from app.utils import canonical_json, sha256_cid, now_iso  # noqa: E402
-
-def b64u(data: bytes) -> str:
-    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+from app.utils import b64u_digest32, canonical_json, sha256_cid, now_iso  # noqa: E402
 
 def main():
     p = argparse.ArgumentParser()
@@ -42,7 +39,7 @@ def main():
     ts = args.ts or now_iso()
     trace = args.trace or f'trace-{ts}'
     mac_msg = f"{cid}|{trace}|{ts}".encode()
-    mac = b64u(hmac.new(args.secret.encode('utf-8'), mac_msg, hashlib.sha256).digest())
+    mac = b64u_digest32(hmac.digest(args.secret.encode('utf-8'), mac_msg, 'sha256'))
     out = {"api_key": args.api_key, "cid": cid, "trace": trace, "ts": ts, "mac": mac}
     print(json.dumps(out, indent=2))
 
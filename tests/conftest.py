@@ -0,0 +1,11 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    # one client (and app lifespan) for the whole run; env is read per request
+    with TestClient(app) as c:
+        yield c
@@ -1,33 +1,29 @@
 import base64
+import functools
 import hashlib
 import hmac
 import json
 
-from fastapi.testclient import TestClient
-
 from app import sft
-from app.main import app
 from app.utils import canonical_json, sha256_cid
 
-client = TestClient(app)
-
 TEST_SECRETS = {"test-key": "supersecret"}
 
+@functools.lru_cache(maxsize=32)
+def _hmac_prototype(secret_bytes):
+    return hmac.new(secret_bytes, b"", hashlib.sha256)
+
 def _make_mac(payload, payload_type, target_type, trace_id, ts, secret):
     # reproduce server normalization + cid + mac steps
     normalized = sft.normalize(payload, payload_type, target_type)
     normalized_cid = sha256_cid(canonical_json(normalized))
     mac_message = f"{normalized_cid}|{trace_id}|{ts}".encode()
-    mac = (
-        base64.urlsafe_b64encode(
-            hmac.new(secret.encode(), mac_message, hashlib.sha256).digest()
-        )
-        .decode("ascii")
-        .rstrip("=")
-    )
-    return mac
+    h = _hmac_prototype(secret.encode()).copy()
+    h.update(mac_message)
+    # a 32-byte digest is always 43 base64url chars once the single '=' is dropped
+    return base64.urlsafe_b64encode(h.digest())[:43].decode("ascii")
 
-def test_api_key_missing(monkeypatch):
+def test_api_key_missing(client, monkeypatch):
     monkeypatch.setenv("ODIN_API_KEY_SECRETS", json.dumps(TEST_SECRETS))
     env = {
         "payload": {"a": 1},
@@ -39,7 +35,7 @@ def test_api_key_missing(monkeypatch):
     r = client.post("/v1/odin/envelope", json=env)
     assert r.status_code == 401
 
-def test_api_key_invalid_mac(monkeypatch):
+def test_api_key_invalid_mac(client, monkeypatch):
     monkeypatch.setenv("ODIN_API_KEY_SECRETS", json.dumps(TEST_SECRETS))
     env = {
         "payload": {"a": 2},
@@ -52,7 +48,7 @@ def test_api_key_invalid_mac(monkeypatch):
     r = client.post("/v1/odin/envelope", json=env, headers=headers)
     assert r.status_code == 401
 
-def test_api_key_valid(monkeypatch):
+def test_api_key_valid(client, monkeypatch):
     monkeypatch.setenv("ODIN_API_KEY_SECRETS", json.dumps(TEST_SECRETS))
     payload = {"a": 3}
     payload_type = target_type = "foo.bar.v1"
@@ -72,3 +68,64 @@ def test_api_key_valid(monkeypatch):
     j = r.json()
     assert j["trace_id"] == trace_id
     assert "receipt" in j
+
+def test_api_key_secrets_change_picked_up(client, monkeypatch):
+    payload = {"a": 4}
+    payload_type = target_type = "foo.bar.v1"
+    trace_id = "trace-rotate"
+    ts = "2024-01-01T00:00:30Z"
+    mac = _make_mac(payload, payload_type, target_type, trace_id, ts, TEST_SECRETS["test-key"])
+    env = {
+        "payload": payload,
+        "payload_type": payload_type,
+        "target_type": target_type,
+        "trace_id": trace_id,
+        "ts": ts,
+    }
+    headers = {"X-ODIN-API-Key": "test-key", "X-ODIN-API-MAC": mac}
+    monkeypatch.setenv("ODIN_API_KEY_SECRETS", json.dumps(TEST_SECRETS))
+    assert client.post("/v1/odin/envelope", json=env, headers=headers).status_code == 200
+    # rotated secret: the parsed key map is cached per env value, not per process
+    monkeypatch.setenv("ODIN_API_KEY_SECRETS", json.dumps({"test-key": "rotated"}))
+    assert client.post("/v1/odin/envelope", json=env, headers=headers).status_code == 401
+
+_B64U = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+
+def _malleated(mac):
+    # header variants a lenient base64 decoder maps back to the same digest
+    last = _B64U.index(mac[-1])
+    variants = [
+        mac + "=",
+        mac[:-1] + _B64U[last ^ 1],  # flips one of the 2 unused low bits
+        mac[:20] + "!!*" + mac[20:],
+    ]
+    if "-" in mac:
+        variants.append(mac.replace("-", "+"))
+    if "_" in mac:
+        variants.append(mac.replace("_", "/"))
+    return variants
+
+def test_api_key_mac_must_match_exactly(client, monkeypatch):
+    monkeypatch.setenv("ODIN_API_KEY_SECRETS", json.dumps(TEST_SECRETS))
+    payload_type = target_type = "foo.bar.v1"
+    ts = "2024-01-01T00:00:40Z"
+    # pick a payload whose MAC exercises the alphabet-swap variants too
+    for n in range(1000):
+        payload = {"a": n}
+        trace_id = f"trace-strict-{n}"
+        mac = _make_mac(payload, payload_type, target_type, trace_id, ts, TEST_SECRETS["test-key"])
+        if "-" in mac or "_" in mac:
+            break
+    env = {
+        "payload": payload,
+        "payload_type": payload_type,
+        "target_type": target_type,
+        "trace_id": trace_id,
+        "ts": ts,
+    }
+    for bad in _malleated(mac):
+        headers = {"X-ODIN-API-Key": "test-key", "X-ODIN-API-MAC": bad}
+        r = client.post("/v1/odin/envelope", json=env, headers=headers)
+        assert r.status_code == 401, bad
+    headers = {"X-ODIN-API-Key": "test-key", "X-ODIN-API-MAC": mac}
+    assert client.post("/v1/odin/envelope", json=env, headers=headers).status_code == 200
@@ -1,11 +1,8 @@
 import json
-from fastapi.testclient import TestClient
-from app.main import app
 
-def test_billing_usage_requires_key(monkeypatch):
+def test_billing_usage_requires_key(client, monkeypatch):
     # configure API keys
     monkeypatch.setenv('ODIN_API_KEY_SECRETS', json.dumps({'k1':'secret'}))
-    client = TestClient(app)
     # missing key
     r = client.get('/v1/billing/usage')
     assert r.status_code == 401
@@ -1,10 +1,8 @@
-from fastapi.testclient import TestClient
-from app.main import app
 from app import billing
 
-def test_billing_tier_free(monkeypatch):
-    monkeypatch.setenv("ODIN_BILLING_TIER", "free")
-    client = TestClient(app)
+def test_billing_tier_free(client, monkeypatch):
+    monkeypatch.setattr(billing, "_TIER_OVERRIDE", None)
+    billing.set_tier_override("free")
     # No API key configured => open
     r = client.get("/v1/billing/tier")
     assert r.status_code == 200
@@ -13,10 +11,10 @@ def test_billing_tier_free(monkeypatch):
     assert data["limit"] is not None
 
 
-def test_billing_tier_with_api_key(monkeypatch):
+def test_billing_tier_with_api_key(client, monkeypatch):
     monkeypatch.setenv("ODIN_API_KEY_SECRETS", '{"k1":"s"}')
-    monkeypatch.setenv("ODIN_BILLING_TIER", "pro")
-    client = TestClient(app)
+    monkeypatch.setattr(billing, "_TIER_OVERRIDE", None)
+    billing.set_tier_override("pro")
     r = client.get("/v1/billing/tier", headers={"X-ODIN-API-Key":"k1"})
     assert r.status_code == 200
     assert r.json()["tier"] == "pro"
@@ -34,9 +32,71 @@ def test_webhook_idempotent(monkeypatch):
     class Session:
         def __init__(self):
             self.line_items = type("LI",(),{"data":[LineItem("price_pro", "li_1")]})
-    monkeypatch.setattr(bm.stripe.checkout.Session, "retrieve", lambda sid, expand=None: Session())
+    monkeypatch.setattr(
+        bm._stripe().checkout.Session, "retrieve", lambda sid, expand=None: Session()
+    )
     monkeypatch.setenv("STRIPE_PRICE_PRO","price_pro")
+    bm._reset_price_tier_map()
     first = bm.handle_webhook_event(ev)
     second = bm.handle_webhook_event(ev)
     assert first["idempotent"] is False
     assert second["idempotent"] is True
+
+
+def test_dynamic_tier_cached_and_invalidated(monkeypatch):
+    monkeypatch.setattr(billing, "_TIER_OVERRIDE", None)
+    project_id = "proj-tier-cache"
+    billing._subscription_cache.pop(project_id, None)
+    billing._tier_cache.pop(project_id, None)
+    assert billing.configured_tier(project_id) == "free"
+    assert project_id in billing._tier_cache
+    # recording new subscription state must not be masked by the cached value
+    billing._record_subscription_state(project_id, tier="pro", status="active")
+    assert billing.configured_tier(project_id) == "pro"
+
+
+def test_idempotency_window_evicts_oldest(monkeypatch):
+    monkeypatch.setattr(billing, "_processed_events", billing.OrderedDict())
+    monkeypatch.setattr(billing, "_PROCESSED_EVENTS_MAX", 3)
+    for eid in ("e1", "e2", "e3", "e2", "e4"):
+        billing._remember_event_id(eid)
+    assert list(billing._processed_events) == ["e2", "e3", "e4"]
+
+
+def test_refresh_env_rereads_persist_flag(monkeypatch):
+    monkeypatch.setattr(billing, "_PERSIST_IDEMPOTENCY", False)
+    monkeypatch.setenv("BILLING_PERSIST_IDEMPOTENCY", "Yes")
+    assert billing._PERSIST_IDEMPOTENCY is False
+    billing.refresh_env()
+    assert billing._PERSIST_IDEMPOTENCY is True
+
+
+def test_idempotency_window_safe_under_concurrent_inserts(monkeypatch):
+    import threading
+
+    monkeypatch.setattr(billing, "_processed_events", billing.OrderedDict())
+    monkeypatch.setattr(billing, "_PROCESSED_EVENTS_MAX", 50)
+
+    def worker(n):
+        for i in range(500):
+            billing._remember_event_id(f"evt_{n}_{i}")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(billing._processed_events) == 50
+
+
+def test_month_key_cached_until_rollover(monkeypatch):
+    monkeypatch.setattr(billing, "_month_key_cache", (0.0, ""))
+    key = billing._current_month_key()
+    now = billing.utc_now()
+    assert key == f"{now.year:04d}-{now.month:02d}"
+    expires_at, cached = billing._month_key_cache
+    assert cached == key
+    # expiry is the first instant of next month
+    rollover = billing.datetime.datetime.fromtimestamp(expires_at, tz=billing.datetime.UTC)
+    assert (rollover.day, rollover.hour, rollover.minute) == (1, 0, 0)
+    assert rollover > now
@@ -0,0 +1,37 @@
+import json
+import random
+
+import pytest
+
+from app.utils import canonical_json
+
+
+def _stdlib(obj):
+    return json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+@pytest.mark.parametrize("obj", [
+    {"b": 1, "a": [1, 2.5, True, None], "é": " x"},
+    {"big": 1e16, "small": -1e-7},
+    [float("inf"), 1.5e300],
+    1e16,
+    {"n": 2 ** 70},
+    {1: "int key"},
+    {"s": "sha256:3e5:1e5"},
+])
+def test_canonical_json_matches_stdlib_bytes(obj):
+    assert canonical_json(obj) == _stdlib(obj)
+
+
+@pytest.mark.parametrize("exp", range(-30, 30))
+def test_canonical_json_floats_match_stdlib_across_exponents(exp):
+    rng = random.Random(exp)
+    for _ in range(50):
+        value = rng.uniform(1, 10) * 10.0 ** exp
+        obj = {"rate": value, "neg": [-value], "short": float(f"{value:.1g}")}
+        assert canonical_json(obj) == _stdlib(obj)
+
+
+@pytest.mark.parametrize("value", [5e-05, 1e-05, 9.99e-05, 0.0001, 1e15, 123456789012345.6, 1.0])
+def test_canonical_json_float_boundaries(value):
+    assert canonical_json({"rate": value}) == _stdlib({"rate": value})
@@ -0,0 +1,22 @@
+import os
+
+from app.crypto import GatewaySigner, merge_jwks
+from app.utils import b64u
+
+
+def test_public_jwk_is_stable_copy():
+    signer = GatewaySigner(b64u(os.urandom(32)), "gw-test")
+    jwk = signer.public_jwk()
+    assert jwk["kty"] == "OKP" and jwk["crv"] == "Ed25519" and jwk["kid"] == "gw-test"
+    jwk["kid"] = "mutated"
+    assert signer.public_jwk()["kid"] == "gw-test"
+    assert signer.public_jwk() == signer.public_jwk()
+
+
+def test_merge_jwks_parses_additional_keys():
+    extra = '{"keys": [{"kty": "OKP", "kid": "old"}, "junk"]}'
+    first = merge_jwks({"kid": "active"}, extra)
+    assert [k["kid"] for k in first["keys"]] == ["active", "old"]
+    first["keys"][1]["kid"] = "mutated"
+    assert merge_jwks(None, extra)["keys"] == [{"kty": "OKP", "kid": "old"}]
+    assert merge_jwks(None, "not json") == {"keys": []}
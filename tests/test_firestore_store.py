@@ -15,10 +15,16 @@ def test_firestore_store_add_and_chain(monkeypatch):
             return self._data
 
     class StubWhereQuery:
-        def __init__(self, trace_id):
+        def __init__(self, trace_id, order=()):
             self.trace_id = trace_id
+            self.order = order
+        def order_by(self, field):
+            return StubWhereQuery(self.trace_id, (*self.order, field))
         def stream(self):
-            return [StubDoc(d) for d in storage if d.get("trace_id") == self.trace_id]
+            docs = [d for d in storage if d.get("trace_id") == self.trace_id]
+            if self.order:
+                docs.sort(key=lambda d: tuple(d[f] for f in self.order))
+            return [StubDoc(d) for d in docs]
 
     class StubCollection:
         def add(self, data):
@@ -34,6 +40,7 @@ def test_firestore_store_add_and_chain(monkeypatch):
         self.client = None
         self.collection = collection
         self.path = f"firestore://{project_id}/{collection}"
+        self.tail_ttl_seconds = 5.0  # opt in to reusing our own tail
     monkeypatch.setattr(receipts.FirestoreReceiptStore, "__init__", fake_init)
     monkeypatch.setattr(
         receipts.FirestoreReceiptStore,
@@ -48,7 +55,66 @@ def test_firestore_store_add_and_chain(monkeypatch):
 
     r1 = store.add({"trace_id": "t1", "hop": 0, "ts": "2024-01-01T00:00:00Z"})
     assert r1.get("receipt_hash")
-    store.add({"trace_id": "t1", "hop": 1, "ts": "2024-01-01T00:00:10Z"})
+    r2 = store.add({"trace_id": "t1", "hop": 1, "ts": "2024-01-01T00:00:10Z"})
+    # our own last write is reused as the tail instead of querying Firestore
+    assert r2["prev_receipt_hash"] == r1["receipt_hash"]
     chain = store.chain("t1")
     assert len(chain) == 2
     assert chain[0]["hop"] == 0 and chain[1]["hop"] == 1
+    # ordering comes from the query (order_by hop, ts), not insertion order
+    store.add({"trace_id": "t2", "hop": 1, "ts": "2024-01-01T00:00:20Z"})
+    store.add({"trace_id": "t2", "hop": 0, "ts": "2024-01-01T00:00:30Z"})
+    assert [r["hop"] for r in store.chain("t2")] == [0, 1]
+
+
+def test_firestore_tail_queried_by_default():
+    store = object.__new__(receipts.FirestoreReceiptStore)
+    store._tail = ("sha256:own", receipts.time.monotonic())
+    assert store.tail_ttl_seconds == 0
+    # without the opt-in, the latest stored receipt (any instance) is always queried
+    assert store._cached_tail() is None
+
+
+def test_billing_negative_caches_missing_docs(monkeypatch):
+    from app import billing
+
+    gets = []
+
+    class MissingSnap:
+        exists = False
+
+    class StubDocRef:
+        def __init__(self, name, doc_id):
+            self.key = (name, doc_id)
+
+        def get(self):
+            gets.append(self.key)
+            return MissingSnap()
+
+    class StubCollection:
+        def __init__(self, name):
+            self.name = name
+
+        def document(self, doc_id):
+            return StubDocRef(self.name, doc_id)
+
+    class StubClient:
+        def collection(self, name):
+            return StubCollection(name)
+
+    monkeypatch.setattr(billing, "_firestore_client", lambda: StubClient())
+    project_id = "proj-neg-cache"
+    billing._subscription_cache.pop(project_id, None)
+    billing._sub_neg_cache.pop(project_id, None)
+
+    assert billing._load_subscription_state(project_id) is None
+    assert billing._load_subscription_state(project_id) is None
+    assert billing._load_usage_firestore(project_id, "2025-01") is None
+    assert billing._load_usage_firestore(project_id, "2025-01") is None
+    assert gets == [
+        ("billing_subscriptions", f"sub_{project_id}"),
+        ("billing_usage", f"{project_id}_2025-01"),
+    ]
+    # recording state clears the negative entry
+    billing._record_subscription_state(project_id, tier="pro", status="active")
+    assert project_id not in billing._sub_neg_cache
@@ -1,11 +1,9 @@
-from fastapi.testclient import TestClient
+import httpx
 
-from app import billing as billing_module
-from app.main import app
+from app import billing as billing_module, hel, main as main_module
 
-client = TestClient(app)
 
-def test_health_and_jwks():
+def test_health_and_jwks(client):
     r = client.get("/healthz")
     assert r.status_code == 200
     j = r.json()
@@ -15,7 +13,7 @@ def test_health_and_jwks():
     rj = client.get("/.well-known/jwks.json").json()
     assert "keys" in rj
 
-def test_envelope_and_chain(monkeypatch):
+def test_envelope_and_chain(client, monkeypatch):
     # set fake signer env and reload app signer if needed
     # (here we rely on process env set before import for simplicity)
     env = {
@@ -38,9 +36,10 @@ def test_envelope_and_chain(monkeypatch):
     assert "X-ODIN-Response-CID" in exp.headers
 
 
-def test_forward_blocked(monkeypatch):
+def test_forward_blocked(client, monkeypatch):
     # configure HEL allowlist to NOT include blocked.example.com
     monkeypatch.setenv("HEL_ALLOWLIST", "allowed.example.com")
+    monkeypatch.setattr(hel, "_ALLOW_SET", None)
     env = {
         "payload": {"hello": "world"},
         "payload_type": "openai.tooluse.invoice.v1",
@@ -51,6 +50,45 @@ def test_forward_blocked(monkeypatch):
     assert r.status_code == 403
 
 
+def test_forward_uses_shared_client(client, monkeypatch):
+    monkeypatch.setenv("HEL_ALLOWLIST", "allowed.example.com")
+    monkeypatch.setattr(hel, "_ALLOW_SET", None)
+    seen = []
+
+    def handler(request):
+        seen.append(str(request.url))
+        return httpx.Response(202)
+
+    fake = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(main_module, "_forward_client", fake)
+    env = {
+        "payload": {"hello": "world"},
+        "payload_type": "vendor.event.v1",
+        "target_type": "canonical.event.v1",
+        "forward_url": "https://allowed.example.com/hook",
+    }
+    for _ in range(2):
+        r = client.post("/v1/odin/envelope", json=env)
+        assert r.status_code == 200
+        assert r.json()["forwarded"] == {"status_code": 202}
+    assert seen == ["https://allowed.example.com/hook"] * 2
+
+
+def test_forward_client_reopened_by_each_lifespan(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main_module, "_forward_client", None)
+    seen = []
+    for _ in range(2):
+        with TestClient(main_module.app):
+            fwd = main_module._forward_client
+            assert fwd is not None and not fwd.is_closed
+            seen.append(fwd)
+        assert seen[-1].is_closed
+    assert seen[0] is not seen[1]
+    assert main_module._forward_client is None
+
+
 def test_receipt_chain_cache(monkeypatch, tmp_path):
     # Force local file store (avoid Firestore) and enable cache
     monkeypatch.delenv('FIRESTORE_PROJECT', raising=False)
@@ -68,21 +106,40 @@ def test_receipt_chain_cache(monkeypatch, tmp_path):
     assert [r['hop'] for r in second] == [1, 2]
 
 
-def test_free_tier_quota(monkeypatch):
+def test_free_tier_quota(client, monkeypatch):
     # Reset billing usage state
     billing_module._usage_cache.clear()
     billing_module._usage_cache_month = None
     # Force free tier with limit 1
-    monkeypatch.setenv("ODIN_BILLING_TIER", "free")
+    monkeypatch.setattr(billing_module, "_TIER_OVERRIDE", None)
+    billing_module.set_tier_override("free")
     monkeypatch.setenv("FREE_TIER_MONTHLY_RECEIPT_LIMIT", "1")
-    from app.main import app as appref
-    local_client = TestClient(appref)
     env = {
         "payload": {"x": 1},
         "payload_type": "vendor.event.v1",
         "target_type": "canonical.event.v1",
     }
-    r1 = local_client.post("/v1/odin/envelope", json=env)
+    r1 = client.post("/v1/odin/envelope", json=env)
     assert r1.status_code == 200
-    r2 = local_client.post("/v1/odin/envelope", json=env)
+    r2 = client.post("/v1/odin/envelope", json=env)
     assert r2.status_code == 402
+
+
+def test_normalized_cid_cached_for_mapped_payloads(client, monkeypatch):
+    monkeypatch.setattr(main_module, "_normalized_cids", main_module.OrderedDict())
+    env = {
+        "payload": {"invoice_id": "INV-cache", "total": 10, "currency": "EUR"},
+        "payload_type": "invoice.vendor.v1",
+        "target_type": "invoice.iso20022.v1",
+    }
+    r1 = client.post("/v1/odin/envelope", json=env)
+    assert r1.status_code == 200
+
+    def fail(*args, **kwargs):
+        raise AssertionError("normalize not expected for a cached payload")
+
+    monkeypatch.setattr(main_module.sft, "normalize", fail)
+    r2 = client.post("/v1/odin/envelope", json=env)
+    assert r2.status_code == 200
+    cid = r1.json()["receipt"]["normalized_cid"]
+    assert r2.json()["receipt"]["normalized_cid"] == cid
@@ -0,0 +1,26 @@
+from app import hel
+
+
+def test_allowlist_case_insensitive_and_decoded(monkeypatch):
+    monkeypatch.setenv("HEL_ALLOWLIST", "API.Example.com, hooks.example.org__SL__ ,")
+    monkeypatch.setattr(hel, "_ALLOW_SET", None)
+    allowed, reason = hel.check_forward_allowed("https://api.example.com/x")
+    assert allowed is True and reason == "allowed:api.example.com"
+    assert hel.check_forward_allowed("https://evil.example.com/x")[0] is False
+
+
+def test_refresh_allowlist_picks_up_env_change(monkeypatch):
+    monkeypatch.setenv("HEL_ALLOWLIST", "a.example.com")
+    monkeypatch.setattr(hel, "_ALLOW_SET", None)
+    assert hel.check_forward_allowed("https://b.example.com/")[0] is False
+    monkeypatch.setenv("HEL_ALLOWLIST", "b.example.com")
+    hel.refresh_allowlist()
+    assert hel.check_forward_allowed("https://b.example.com/")[0] is True
+
+
+def test_no_allowlist_denies(monkeypatch):
+    monkeypatch.delenv("HEL_ALLOWLIST", raising=False)
+    monkeypatch.setattr(hel, "_ALLOW_SET", None)
+    allowed, reason = hel.check_forward_allowed("https://a.example.com/")
+    assert allowed is False and reason == "deny_no_allowlist_configured"
+    assert hel.check_forward_allowed(None) == (True, "no_forward_url")
@@ -19,3 +19,70 @@ def test_injected_usage_publisher(monkeypatch):
     assert all(p[0] == "sub_item_123" and p[1] == 1 for p in published)
     # timestamps should be integers
     assert all(isinstance(p[2], int) for p in published)
+
+
+def _forget_project_on_teardown(monkeypatch, project_id):
+    # placeholders via setitem so whatever the test caches is removed afterwards
+    monkeypatch.setitem(billing._subscription_cache, project_id, {})
+    monkeypatch.setitem(billing._tier_cache, project_id, (0.0, "free"))
+
+
+def test_stripe_usage_coalesced_per_item(monkeypatch):
+    monkeypatch.setattr(billing, "_usage_publisher", None)
+    monkeypatch.setenv("STRIPE_API_KEY", "sk_test_dummy")
+    monkeypatch.setattr(billing, "_LOCAL_ONLY", False)
+    monkeypatch.setenv("ODIN_USAGE_FLUSH_SEC", "3600")
+    monkeypatch.setattr(billing, "_ensure_usage_flusher", lambda: None)  # flush by hand
+    project_id = "proj-coalesce"
+    _forget_project_on_teardown(monkeypatch, project_id)
+    billing._record_subscription_state(  # type: ignore
+        project_id, tier="pro", status="active", usage_item="si_coalesce"
+    )
+
+    published = []
+    monkeypatch.setattr(
+        billing, "_publish_usage_record", lambda item, qty: published.append((item, qty))
+    )
+    for _ in range(5):
+        billing.record_receipt(project_id, metered=True)
+    # nothing sent on the request path
+    assert published == []
+    billing.flush_metered_usage()
+    assert published == [("si_coalesce", 5)]
+
+
+def test_local_only_fast_path_counts_without_tier_lookup(monkeypatch):
+    monkeypatch.setattr(billing, "_usage_publisher", None)
+    monkeypatch.setattr(billing, "_LOCAL_ONLY", True)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("tier lookup not expected on the local-only path")
+
+    monkeypatch.setattr(billing, "configured_tier", fail)
+    before = billing.current_usage("proj-local")
+    billing.record_receipt("proj-local", metered=True)
+    assert billing.current_usage("proj-local") == before + 1
+
+
+def test_injected_usage_publisher_batched(monkeypatch):
+    monkeypatch.setattr(billing, "_usage_publisher", None)
+    monkeypatch.setattr(billing, "_usage_publisher_batched", False)
+    monkeypatch.setattr(billing, "_ensure_usage_flusher", lambda: None)  # flush by hand
+    monkeypatch.setenv("ODIN_USAGE_FLUSH_SEC", "3600")
+    project_id = "proj-batched"
+    _forget_project_on_teardown(monkeypatch, project_id)
+    billing._record_subscription_state(  # type: ignore
+        project_id, tier="pro", status="active", usage_item="si_batched"
+    )
+
+    published = []
+    billing.inject_usage_publisher(
+        lambda item, qty, ts: published.append((item, qty, ts)), flush_mode="batched"
+    )
+    for _ in range(3):
+        billing.record_receipt(project_id, metered=True)
+    assert published == []
+    billing.flush_metered_usage()
+    assert len(published) == 1
+    assert published[0][:2] == ("si_batched", 3)
+    assert isinstance(published[0][2], int)
@@ -1,21 +1,16 @@
-from fastapi.testclient import TestClient
+import re
+import threading
 
-from app.main import app
+from app import main as main_module
+
+_METRIC_RE = re.compile(r"^([a-zA-Z_:][\w:]*(?:\{[^}]*\})?)\s+([\-\d.eE+]+)$", re.M)
 
-client = TestClient(app)
 
 def _parse_metrics(text: str):
-    data = {}
-    for line in text.splitlines():
-        if line.startswith("#") or not line.strip():
-            continue
-        parts = line.split()
-        if len(parts) == 2:
-            data[parts[0]] = float(parts[1])
-    return data
+    return {name: float(value) for name, value in _METRIC_RE.findall(text)}
 
 
-def test_metrics_counts_increment():
+def test_metrics_counts_increment(client):
     # capture baseline
     r1 = client.get("/metrics")
     assert r1.status_code == 200
@@ -43,3 +38,32 @@ def test_metrics_counts_increment():
     assert any("_bucket" in line for line in metrics_lines)
     assert any(line.startswith("odin_request_latency_seconds_sum") for line in metrics_lines)
     assert any(line.startswith("odin_request_latency_seconds_count") for line in metrics_lines)
+
+
+def test_metrics_recorded_from_several_threads():
+    before = main_module._metrics_snapshot()
+
+    def worker():
+        for _ in range(100):
+            main_module._record_metrics(0.2)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    after = main_module._metrics_snapshot()
+    assert after["requests_total"] - before["requests_total"] == 400
+    assert after["latency_buckets"][0.25] - before["latency_buckets"][0.25] == 400
+
+
+def test_metrics_body_cached_within_ttl(client, monkeypatch):
+    monkeypatch.setattr(main_module, "_METRICS_CACHE_TTL", 60.0)
+    monkeypatch.setattr(main_module, "_metrics_cache", (0.0, b""))
+    first = client.get("/metrics").text
+    main_module._record_metrics(0.01)
+    # within the TTL the previous rendering is served unchanged
+    assert client.get("/metrics").text == first
+
+    monkeypatch.setattr(main_module, "_METRICS_CACHE_TTL", 0.0)
+    assert client.get("/metrics").text != first
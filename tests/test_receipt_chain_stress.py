@@ -22,8 +22,7 @@ def test_receipt_chain_stress(tmp_path):
     chain = store.chain(trace_id)
     assert len(chain) == total
     # verify chain ordering and hash linkage
-    for idx, rec in enumerate(chain):
-        if idx == 0:
-            assert rec.get('prev_receipt_hash') is None
-        else:
-            assert rec.get('prev_receipt_hash') == chain[idx-1].get('receipt_hash')
+    assert chain[0].get('prev_receipt_hash') is None
+    links = [r.get('prev_receipt_hash') for r in chain[1:]]
+    assert links == [r.get('receipt_hash') for r in chain[:-1]]
+
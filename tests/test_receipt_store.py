@@ -0,0 +1,158 @@
+import json
+
+from app import receipts as rc
+
+
+def test_append_only_store_reloads_tail_and_index(tmp_path, monkeypatch):
+    monkeypatch.delenv("ODIN_RETENTION_MAX_AGE_SECONDS", raising=False)
+    path = tmp_path / "r.jsonl"
+    store = rc.ReceiptStore(str(path))
+    first = store.add({"trace_id": "a", "hop": 0, "ts": "2025-01-01T00:00:00Z"})
+    second = store.add({"trace_id": "b", "hop": 0, "ts": "2025-01-01T00:00:01Z"})
+    assert second["prev_receipt_hash"] == first["receipt_hash"]
+
+    reopened = rc.ReceiptStore(str(path))
+    third = reopened.add({"trace_id": "a", "hop": 1, "ts": "2025-01-01T00:00:02Z"})
+    assert third["prev_receipt_hash"] == second["receipt_hash"]
+    assert [r["hop"] for r in reopened.chain("a")] == [0, 1]
+    assert reopened.chain("missing") == []
+
+
+def test_chain_index_kept_in_hop_order(tmp_path, monkeypatch):
+    monkeypatch.delenv("ODIN_RETENTION_MAX_AGE_SECONDS", raising=False)
+    path = tmp_path / "r.jsonl"
+    store = rc.ReceiptStore(str(path))
+    for hop, ts in ((2, "t2"), (0, "t0"), (1, "t1b"), (1, "t1a")):
+        store.add({"trace_id": "a", "hop": hop, "ts": ts})
+    expected = [(0, "t0"), (1, "t1a"), (1, "t1b"), (2, "t2")]
+    assert [(r["hop"], r["ts"]) for r in store.chain("a")] == expected
+    reopened = rc.ReceiptStore(str(path))
+    assert [(r["hop"], r["ts"]) for r in reopened.chain("a")] == expected
+
+
+def test_tail_loaded_from_log_without_trailing_newline(tmp_path, monkeypatch):
+    monkeypatch.delenv("ODIN_RETENTION_MAX_AGE_SECONDS", raising=False)
+    path = tmp_path / "r.jsonl"
+    first = rc.ReceiptStore(str(path)).add({"trace_id": "a", "hop": 0, "ts": "t0"})
+    path.write_text(path.read_text().rstrip("\n"))  # e.g. truncated by an external tool
+    store = rc.ReceiptStore(str(path))
+    second = store.add({"trace_id": "a", "hop": 1, "ts": "t1"})
+    assert second["prev_receipt_hash"] == first["receipt_hash"]
+    assert len(path.read_text().splitlines()) == 2
+    assert [r["hop"] for r in rc.ReceiptStore(str(path)).chain("a")] == [0, 1]
+
+
+def test_non_object_and_corrupt_lines_skipped_on_load(tmp_path, monkeypatch):
+    monkeypatch.delenv("ODIN_RETENTION_MAX_AGE_SECONDS", raising=False)
+    path = tmp_path / "r.jsonl"
+    first = rc.ReceiptStore(str(path)).add({"trace_id": "a", "hop": 0, "ts": "t0"})
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('[]\n1\n"x"\n{not json\n')
+    store = rc.ReceiptStore(str(path))
+    assert [r["hop"] for r in store.chain("a")] == [0]
+    second = store.add({"trace_id": "a", "hop": 1, "ts": "t1"})
+    assert second["prev_receipt_hash"] == first["receipt_hash"]
+
+
+def test_stores_sharing_a_log_follow_each_others_appends(tmp_path, monkeypatch):
+    # e.g. two uvicorn workers on one file
+    monkeypatch.delenv("ODIN_RETENTION_MAX_AGE_SECONDS", raising=False)
+    monkeypatch.delenv("ODIN_RECEIPT_WRITE_BUFFERED", raising=False)
+    path = tmp_path / "r.jsonl"
+    w1 = rc.ReceiptStore(str(path))
+    w2 = rc.ReceiptStore(str(path))
+    first = w1.add({"trace_id": "a", "hop": 0, "ts": "t0"})
+    second = w2.add({"trace_id": "a", "hop": 1, "ts": "t1"})
+    assert second["prev_receipt_hash"] == first["receipt_hash"]
+    third = w1.add({"trace_id": "a", "hop": 2, "ts": "t2"})
+    assert third["prev_receipt_hash"] == second["receipt_hash"]
+    assert [r["hop"] for r in w1.chain("a")] == [0, 1, 2]
+    assert [r["hop"] for r in w2.chain("a")] == [0, 1, 2]
+
+
+def test_store_rescans_log_rewritten_by_another_writer(tmp_path, monkeypatch):
+    monkeypatch.delenv("ODIN_RETENTION_MAX_AGE_SECONDS", raising=False)
+    monkeypatch.delenv("ODIN_RECEIPT_WRITE_BUFFERED", raising=False)
+    monkeypatch.setattr(rc, "PRUNE_EVERY_INSERTS", 1)
+    path = tmp_path / "r.jsonl"
+    reader = rc.ReceiptStore(str(path))
+    reader.add({"trace_id": "old", "hop": 0, "ts": "2000-01-01T00:00:00+00:00"})
+    compactor = rc.ReceiptStore(str(path), max_age_seconds=3600)
+    last = compactor.add({"trace_id": "new", "hop": 0, "ts": "2999-01-01T00:00:00+00:00"})
+    assert reader.chain("old") == []
+    nxt = reader.add({"trace_id": "new", "hop": 1, "ts": "2999-01-01T00:00:01+00:00"})
+    assert nxt["prev_receipt_hash"] == last["receipt_hash"]
+    assert len(path.read_text().splitlines()) == 2
+
+
+def test_trace_index_bounded_and_evicted_traces_read_from_log(tmp_path, monkeypatch):
+    monkeypatch.delenv("ODIN_RETENTION_MAX_AGE_SECONDS", raising=False)
+    monkeypatch.setenv("ODIN_RECEIPT_INDEX_MAX_TRACES", "2")
+    path = tmp_path / "r.jsonl"
+    store = rc.ReceiptStore(str(path))
+    for trace_id in ("a", "b", "c"):
+        store.add({"trace_id": trace_id, "hop": 0, "ts": "t0"})
+    assert list(store._by_trace) == ["b", "c"]
+    # a was evicted: its next hop is indexed, the earlier one comes from the log
+    store.add({"trace_id": "a", "hop": 1, "ts": "t1"})
+    assert len(store._by_trace) == 2
+    assert [r["hop"] for r in store.chain("a")] == [0, 1]
+    assert [r["hop"] for r in store.chain("b")] == [0]
+    assert store.chain("missing") == []
+
+
+def test_retention_applied_by_periodic_compaction(tmp_path, monkeypatch):
+    monkeypatch.delenv("ODIN_RETENTION_MAX_AGE_SECONDS", raising=False)
+    monkeypatch.setattr(rc, "PRUNE_EVERY_INSERTS", 2)
+    path = tmp_path / "r.jsonl"
+    store = rc.ReceiptStore(str(path), max_age_seconds=3600)
+    store.add({"trace_id": "old", "hop": 0, "ts": "2000-01-01T00:00:00+00:00"})
+    assert len(path.read_text().splitlines()) == 1
+    # second insert triggers compaction before appending
+    store.add({"trace_id": "new", "hop": 0, "ts": "2999-01-01T00:00:00+00:00"})
+    lines = [json.loads(ln) for ln in path.read_text().splitlines()]
+    assert [r["trace_id"] for r in lines] == ["new"]
+    assert store.chain("old") == []
+    assert len(store.chain("new")) == 1
+
+
+def test_caching_store_extends_cached_chain_on_add(tmp_path, monkeypatch):
+    monkeypatch.delenv("ODIN_RETENTION_MAX_AGE_SECONDS", raising=False)
+    base = rc.ReceiptStore(str(tmp_path / "r.jsonl"))
+    calls = []
+    real_chain = base.chain
+    monkeypatch.setattr(base, "chain", lambda tid: calls.append(tid) or real_chain(tid))
+    store = rc.CachingReceiptStore(base)
+    store.add({"trace_id": "t", "hop": 1, "ts": "2025-01-01T00:00:01Z"})
+    assert len(store.chain("t")) == 1
+    store.add({"trace_id": "t", "hop": 0, "ts": "2025-01-01T00:00:00Z"})
+    assert [r["hop"] for r in store.chain("t")] == [0, 1]
+    assert calls == ["t"]
+
+
+def test_caching_store_evicts_least_recently_refreshed(tmp_path, monkeypatch):
+    monkeypatch.delenv("ODIN_RETENTION_MAX_AGE_SECONDS", raising=False)
+    monkeypatch.setenv("ODIN_RECEIPT_CACHE_SIZE", "2")
+    base = rc.ReceiptStore(str(tmp_path / "r.jsonl"))
+    for tid in ("a", "b", "c"):
+        base.add({"trace_id": tid, "hop": 0, "ts": "2025-01-01T00:00:00Z"})
+    store = rc.CachingReceiptStore(base)
+    store.chain("a")
+    store.chain("b")
+    store.chain("c")  # over the 2-receipt cap: "a" goes first
+    assert list(store._chains) == ["b", "c"]
+    assert store._total_cached == 2
+
+
+def test_buffered_writes_flushed_on_chain(tmp_path, monkeypatch):
+    monkeypatch.delenv("ODIN_RETENTION_MAX_AGE_SECONDS", raising=False)
+    monkeypatch.setenv("ODIN_RECEIPT_WRITE_BUFFERED", "1")
+    path = tmp_path / "r.jsonl"
+    store = rc.ReceiptStore(str(path))
+    store.add({"trace_id": "a", "hop": 0, "ts": "t0"})
+    assert path.read_bytes() == b""  # still in the 64 KiB buffer
+    assert len(store.chain("a")) == 1
+    assert len(path.read_text().splitlines()) == 1
+    store.add({"trace_id": "a", "hop": 1, "ts": "t1"})
+    store.close()
+    assert len(path.read_text().splitlines()) == 2
@@ -0,0 +1,79 @@
+from app import billing
+
+
+class StubDocRef:
+    def __init__(self, doc_id):
+        self.id = doc_id
+
+
+class StubCollection:
+    def document(self, doc_id):
+        return StubDocRef(doc_id)
+
+
+class StubBatch:
+    def __init__(self, commits):
+        self._commits = commits
+        self._writes = []
+
+    def set(self, ref, data, merge=False):
+        assert merge is True
+        self._writes.append((ref.id, data))
+
+    def commit(self):
+        self._commits.append(self._writes)
+
+
+class StubClient:
+    def __init__(self):
+        self.commits = []
+
+    def collection(self, name):
+        assert name == "billing_usage"
+        return StubCollection()
+
+    def batch(self):
+        return StubBatch(self.commits)
+
+
+def test_usage_writes_coalesced_into_single_batch(monkeypatch):
+    stub = StubClient()
+    monkeypatch.setattr(billing, "_firestore_client", lambda: stub)
+    for count in (50, 100, 150):
+        billing._usage_write_queue.put_nowait(("p1", "2025-01", count))
+    billing._usage_write_queue.put_nowait(("p2", "2025-01", 50))
+
+    billing.flush_usage_writes()
+
+    assert len(stub.commits) == 1
+    writes = dict(stub.commits[0])
+    assert set(writes) == {"p1_2025-01", "p2_2025-01"}
+    # latest snapshot per doc wins
+    assert writes["p1_2025-01"]["count"] == 150
+    assert writes["p2_2025-01"]["count"] == 50
+    assert billing._usage_write_queue.empty()
+
+
+def test_aborted_usage_batch_retried_with_backoff(monkeypatch):
+    from google.api_core.exceptions import Aborted
+
+    stub = StubClient()
+    attempts = []
+
+    class FlakyBatch(StubBatch):
+        def commit(self):
+            attempts.append(1)
+            if len(attempts) < billing.USAGE_WRITE_MAX_ATTEMPTS:
+                raise Aborted("contention")
+            super().commit()
+
+    monkeypatch.setattr(stub, "batch", lambda: FlakyBatch(stub.commits))
+    monkeypatch.setattr(billing, "_firestore_client", lambda: stub)
+    sleeps = []
+    monkeypatch.setattr(billing.time, "sleep", sleeps.append)
+
+    billing._commit_usage_batch([("p1", "2025-01", 10)])
+
+    assert len(stub.commits) == 1
+    base = billing.USAGE_WRITE_RETRY_BACKOFF_SECONDS
+    assert sleeps == [base * 2 ** i for i in range(billing.USAGE_WRITE_MAX_ATTEMPTS - 1)]
@@ -0,0 +1,15 @@
+import datetime
+
+from app import utils
+
+
+def test_now_iso_is_current_utc_with_microseconds():
+    before = datetime.datetime.now(datetime.UTC)
+    first = utils.now_iso()
+    second = utils.now_iso()  # served from the cached per-second prefix
+    after = datetime.datetime.now(datetime.UTC)
+    for value in (first, second):
+        assert value.endswith("+00:00")
+        parsed = datetime.datetime.fromisoformat(value)
+        assert before - datetime.timedelta(seconds=1) <= parsed <= after
+        assert len(value) == len("2025-01-01T00:00:00.000000+00:00")
@@ -6,11 +6,12 @@ from app import billing
 
 def test_checkout_session_completed_usage_item(monkeypatch):
     # Ensure automatic tier detection (not forced override)
-    monkeypatch.delenv("ODIN_BILLING_TIER", raising=False)
+    monkeypatch.setattr(billing, "_TIER_OVERRIDE", None)
 
     # Provide pricing environment variables
     monkeypatch.setenv("STRIPE_PRICE_PRO", "price_pro_123")
     monkeypatch.setenv("STRIPE_PRICE_USAGE", "price_usage_456")
+    billing._reset_price_tier_map()
 
     project_id = "proj-test-usage"
 
@@ -65,3 +66,79 @@ def test_checkout_session_completed_usage_item(monkeypatch):
     sub_state = billing._subscription_cache.get(project_id)  # type: ignore[attr-defined]
     assert sub_state is not None
     assert sub_state.get("usage_item") == usage_item_id
+
+
+def test_subscription_updated_single_pass(monkeypatch):
+    monkeypatch.setattr(billing, "_TIER_OVERRIDE", None)
+    monkeypatch.setenv("STRIPE_PRICE_PRO", "price_pro_sub")
+    monkeypatch.setenv("STRIPE_PRICE_USAGE", "price_usage_sub")
+    billing._reset_price_tier_map()
+
+    project_id = "proj-sub-updated"
+    event = types.SimpleNamespace(
+        type="customer.subscription.updated",
+        id="evt_sub_updated_1",
+        data={
+            "object": {
+                "status": "active",
+                "items": {
+                    "data": [
+                        {
+                            "id": "si_base",
+                            "price": {
+                                "id": "price_pro_sub",
+                                "metadata": {"project_id": project_id},
+                            },
+                        },
+                        {"id": "si_usage", "price": {"id": "price_usage_sub"}},
+                    ]
+                },
+            }
+        },
+    )
+
+    result = billing.handle_webhook_event(event)
+
+    assert result["tier_changed"] is True
+    assert result["project_id"] == project_id
+    assert result["tier"] == "pro"
+    assert billing._subscription_cache[project_id]["usage_item"] == "si_usage"  # type: ignore[attr-defined]
+
+
+def test_checkout_embedded_line_items_skip_retrieve(monkeypatch):
+    monkeypatch.setattr(billing, "_TIER_OVERRIDE", None)
+    monkeypatch.setenv("STRIPE_PRICE_PRO", "price_pro_emb")
+    monkeypatch.setenv("STRIPE_PRICE_USAGE", "price_usage_emb")
+    billing._reset_price_tier_map()
+
+    class NoRetrieve:
+        @staticmethod
+        def retrieve(sid, expand=None):
+            raise AssertionError("retrieve must not be called")
+
+    fake_stripe = types.SimpleNamespace(checkout=types.SimpleNamespace(Session=NoRetrieve))
+    monkeypatch.setattr(billing, "stripe", fake_stripe)
+
+    project_id = "proj-embedded-items"
+    event = types.SimpleNamespace(
+        type="checkout.session.completed",
+        id="evt_embedded_1",
+        data={
+            "object": {
+                "id": "sess_emb",
+                "metadata": {"project_id": project_id},
+                "line_items": {
+                    "data": [
+                        {"id": "li_base", "price": {"id": "price_pro_emb"}},
+                        {"id": "li_usage", "price": {"id": "price_usage_emb"}},
+                    ]
+                },
+            }
+        },
+    )
+
+    result = billing.handle_webhook_event(event)
+
+    assert result["tier_changed"] is True
+    assert result["tier"] == "pro"
+    assert billing._subscription_cache[project_id]["usage_item"] == "li_usage"  # type: ignore[attr-defined]